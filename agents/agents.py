@@ -88,6 +88,10 @@ task_extract = Task (
 
     ---- ONLY proceed below if the text IS Mandarin Chinese ----
 
+    The following terms were ALREADY FOUND in the glossary. Do NOT extract them again
+    (a longer entity that merely contains one of them, e.g. a title + name, may still be extracted):
+    {known_terms}
+
     If {text} is in Mandarin: From the provided Mandarin {text}, extract the following types of entities:
     - Organisations/associations/societies; companies/ brands; media outlets; political parties
     - government bodies & institutions
@@ -118,7 +122,7 @@ task_extract = Task (
 
     context = [task_lang_check],
 
-    inputs = {"text":"{text}"},
+    inputs = {"text":"{text}", "known_terms":"{known_terms}"},
 
     output_pydantic=EntityList,
 
@@ -135,3 +139,30 @@ extract_entities = Crew(
     verbose = True
 )
 
+
+#task 1 (local language gate) - same extraction, but the language check result is
+#computed locally (helper_functions.chinese_script.check_language) and passed in as {lang_check}
+task_extract_local = Task (
+    description = task_extract.description.replace(
+        "the previous language check (from context)",
+        "the language check given here: {lang_check}"
+    ),
+
+    expected_output = task_extract.expected_output,
+
+    agent = agent_extract,
+
+    inputs = {"text":"{text}", "known_terms":"{known_terms}", "lang_check":"{lang_check}"},
+
+    output_pydantic=EntityList,
+
+    timeout = 180
+)
+
+#crew without the LLM language check - one sequential round trip fewer
+extract_entities_local = Crew(
+    agents = [agent_extract], 
+    tasks =[task_extract_local],
+    process = Process.sequential,
+    verbose = True
+)
@@ -3,7 +3,8 @@ import streamlit as st
 import pandas as pd
 import re
 from langdetect import detect, LangDetectException #added extra measure to detect Chinese text
-from translation_pipeline.run_pipeline import translation_pipeline   # import translation pipeline
+from translation_pipeline.run_pipeline import translation_pipeline_stream, cached_result   # import translation pipeline
+from translation_pipeline.translation_records import record_translation
 from openai_calls.translator import convert_markdown_to_word
 from helper_functions.utility import check_password
 from helper_functions.config import get_secret
@@ -39,6 +40,7 @@ with col2:
 with st.form(key="form"):
     st.subheader("Enter Chinese text to translate")
     user_prompt = st.text_area("Input text", height=200)
+    bypass_cache = st.checkbox("Bypass cache (run the full pipeline again)", value=False)
     submitted = st.form_submit_button("Run Translation")
 
 #identify mixed characters
@@ -62,19 +64,63 @@ if submitted:
             st.warning ("Unable to detect language.  Please check your input.")
             st.stop()
 
-    # #run translation pipeline if Chinese input
-    with st.spinner("Running translation pipeline... this may take a few minutes depending on length of Chinese text ⏳"):
+    # same article, glossary and prompts as an earlier run - serve it instantly
+    hit = None
+    if not bypass_cache:
         try:
-            result, final_terms = translation_pipeline(user_prompt)
+            hit = cached_result(user_prompt)
         except Exception as e:
-            st.error(f"⚠️ An error occurred: {e}")
+            print(f"⚠️ Result cache unavailable: {e}")
+
+    english = None
+    if hit:
+        result, final_terms = hit
+        st.success("⚡ Served from cache - this article was already translated with the current glossary. Tick \"Bypass cache\" to run it again.")
+
+    else:
+        # #run translation pipeline if Chinese input
+        with st.spinner("Running translation pipeline... this may take a few minutes depending on length of Chinese text ⏳"):
+            try:
+                stream, final_terms = translation_pipeline_stream(user_prompt, use_cache=True)
+            except Exception as e:
+                st.error(f"⚠️ An error occurred: {e}. Submit again to resume from the last completed step.")
+                st.stop()
+
+        # show the English translation as it is generated
+        live = st.empty()
+        try:
+            with live.container():
+                st.subheader("English Translation")
+                st.write_stream(stream)
+            result = stream.result
+            english = stream.english
+        except Exception as e:
+            st.error(f"⚠️ An error occurred: {e}. Submit again to resume from the last completed step.")
             st.stop()
+        # replaced by the full layout below
+        live.empty()
 
-        st.success("✨ Translation complete!")
+        if stream.complete:
+            st.success("✨ Translation complete!")
+        else:
+            st.warning(
+                f"⚠️ {len(stream.missing)} paragraph(s) could not be translated and are marked [translation missing]. "
+                "Submit again to retry them."
+            )
+        tm = stream.tm_report
+        if tm["paragraphs"]:
+            st.caption(
+                f"📚 Translation memory: {tm['exact']}/{tm['paragraphs']} paragraphs reused "
+                f"({100 * tm['exact'] / tm['paragraphs']:.0f}%), ~{tm['tokens_saved']:,} tokens saved"
+            )
 
-        # Store result so we can show + download it
-        st.session_state["translation_result"] = result
-        st.session_state["final_terms"] = final_terms
+    # Store result so we can show + download it
+    st.session_state["translation_result"] = result
+    st.session_state["final_terms"] = final_terms
+
+    # remember recent translations so glossary edits can be applied to them (Glossary page)
+    recent = [r for r in st.session_state.get("recent_translations", []) if r["input_text"] != user_prompt]
+    st.session_state["recent_translations"] = [record_translation(user_prompt, result, final_terms, english)] + recent[:4]
 
     # If there is a translation result, display it and offer download
     if "translation_result" in st.session_state:
@@ -114,6 +160,14 @@ if submitted:
                 )
 
             st.dataframe(df_terms)
+
+            # terms left out of web verification by the batch limit
+            skipped = [t["chinese"] for t in final_terms if t.get("status") == "SKIPPED"]
+            if skipped:
+                st.warning(
+                    f"{len(skipped)} term(s) were not verified (verification limit reached) "
+                    "and were translated without a glossary entry: " + "、".join(skipped)
+                )
         
         # if no glossary
         else:
@@ -0,0 +1,65 @@
+# Import
+import os
+import json
+import time
+import shutil
+import hashlib
+from pathlib import Path
+from helper_functions.chinese_script import normalize
+from helper_functions.json_functions import write_json_atomic, read_json
+
+# one folder per pipeline run, named by the hash of input text + config
+CHECKPOINT_DIR = Path(os.environ.get("PIPELINE_CHECKPOINT_DIR", "cache/checkpoints"))
+
+# runs untouched for longer than this (hours) are removed
+CHECKPOINT_TTL_HOURS = float(os.environ.get("PIPELINE_CHECKPOINT_TTL_HOURS", 24))
+
+#stage outputs of one pipeline run, so a retry resumes instead of starting over
+class PipelineCheckpoint:
+    """
+    Persists the output of each pipeline stage (extracted, mapped, verified,
+    final_terms) as one JSON file per stage. Files are written atomically,
+    so a stage file either holds a complete result or does not exist.
+    """
+
+    def __init__(self, input_text: str, config: dict, root=CHECKPOINT_DIR):
+        payload = json.dumps({"text": normalize(input_text), "config": config}, sort_keys=True, ensure_ascii=False)
+        self.run_id = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+        self.root = Path(root)
+        self.folder = self.root / self.run_id
+        purge_checkpoints(self.root)
+
+    def _path(self, stage):
+        return self.folder / f"{stage}.json"
+
+    def load(self, stage):
+        """Saved output of a stage, or None if the stage has not completed."""
+        saved = read_json(self._path(stage))
+        if saved is not None:
+            print(f"♻️ Resuming: '{stage}' loaded from checkpoint {self.run_id}")
+        return saved
+
+    def save(self, stage, obj):
+        write_json_atomic(self._path(stage), obj)
+        return obj
+
+    def completed(self):
+        return sorted(p.stem for p in self.folder.glob("*.json")) if self.folder.exists() else []
+
+    def clear(self):
+        """Remove this run's checkpoints (called once the translation succeeded)."""
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+def purge_checkpoints(root=CHECKPOINT_DIR, ttl_hours=CHECKPOINT_TTL_HOURS):
+    """Delete checkpoint folders not modified within ttl_hours."""
+    root = Path(root)
+    if not root.exists():
+        return 0
+    cutoff = time.time() - ttl_hours * 3600
+    removed = 0
+    for folder in root.iterdir():
+        if folder.is_dir() and folder.stat().st_mtime < cutoff:
+            shutil.rmtree(folder, ignore_errors=True)
+            removed += 1
+    return removed
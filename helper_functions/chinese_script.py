@@ -0,0 +1,148 @@
+# Import
+import re
+import json
+import unicodedata
+from langdetect import DetectorFactory, detect, LangDetectException
+
+# make langdetect deterministic
+DetectorFactory.seed = 0
+
+#remove white space in text
+def normalize(text: str) -> str:
+    """Unicode + whitespace normalization."""
+    return unicodedata.normalize("NFC", str(text)).strip().replace("\u3000", " ")
+
+
+# traditional → simplified pairs for common characters (trad, simp)
+_PAIRS = (
+    "國国為为爲为這这個个們们來来時时說说會会對对學学後后過过發发經经與与動动現现進进產产種种"
+    "實实機机關关長长開开問问當当從从還还頭头將将點点業业義义體体應应處处麼么無无內内間间報报"
+    "員员總总區区電电務务聯联並并資资東东車车門门見见裡里話话讓让聽听讀读書书寫写買买賣卖錢钱"
+    "價价議议論论計计設设認认識识語语請请誰谁調调變变級级紀纪約约紅红統统結结給给線线組组織织"
+    "續续維维網网緊紧綠绿華华萬万葉叶藝艺蘭兰藥药號号術术衛卫衝冲規规視视親亲觀观記记許许評评"
+    "試试詩诗該该詳详誌志課课講讲謝谢證证譯译護护讚赞貝贝負负財财責责貨货質质費费貿贸賓宾賽赛"
+    "贊赞趙赵軍军軟软較较輕轻載载輪轮輸输辦办農农連连週周運运遊游達达違违遠远適适選选遺遗邊边"
+    "鄉乡鄧邓醫医針针鐵铁銀银銷销鋼钢錄录鍵键閉闭閒闲陳陈陸陆陽阳際际隊队隨随險险雙双雜杂雞鸡"
+    "離离難难雲云靜静韓韩頁页項项順顺須须預预領领頻频題题額额顏颜願愿類类顧顾風风飛飞飯饭飲饮"
+    "館馆馬马驗验髮发鬥斗魚鱼鳥鸟麗丽黃黄齊齐齒齿龍龙龜龟劉刘廣广廠厂態态慶庆憲宪戰战戲戏戶户"
+    "擊击據据擁拥擇择擔担擴扩數数斷断於于暫暂曆历歷历條条構构標标樣样樂乐樓楼樹树權权歐欧歲岁"
+    "歸归氣气決决沒没溝沟滅灭漢汉濟济灣湾烏乌熱热爭争爾尔獎奖獨独環环畫画盡尽監监眾众確确礎础"
+    "禮礼禪禅稱称穩稳窮穷競竞筆笔節节範范築筑簡简糧粮細细終终綜综練练編编緣缘縣县績绩繼继罰罚"
+    "習习聖圣聞闻聲声職职肅肃腦脑臨临興兴舉举舊旧莊庄藍蓝蘇苏虛虚蟲虫補补裝装製制複复覺觉覽览"
+    "訊讯訪访詞词詢询誠诚誤误談谈諸诸謀谋謂谓豐丰豬猪貓猫貢贡貧贫販贩貴贵貸贷賀贺賦赋賴赖購购"
+    "贏赢趕赶軌轨輔辅輯辑轉转辭辞邁迈鄭郑鐘钟鎮镇鏡镜閱阅闆板隻只雖虽響响頂顶顯显飾饰養养餘余"
+    "驅驱驚惊鬆松麥麦黨党齡龄壓压壞坏壽寿夢梦奪夺奮奋婦妇孫孙寧宁寶宝專专尋寻導导屆届屬属島岛"
+    "嶺岭幣币師师帶带幫帮幹干庫库廳厅張张彈弹彎弯徑径復复徵征戀恋懷怀懸悬揮挥損损搖摇攝摄敗败"
+    "敵敌斬斩團团園园圍围圖图圓圆場场塊块壇坛壯壮億亿僅仅傳传傷伤傑杰債债優优儀仪儲储兒儿兩两"
+    "冊册劃划劇剧勞劳勢势勵励勝胜協协卻却參参嚴严嗎吗啟启單单嘆叹噴喷嚮向灑洒淚泪溫温測测湯汤"
+    "滿满漁渔潔洁澤泽濃浓災灾爐炉狀状猶犹獅狮瑪玛產产畢毕異异療疗癥症盤盘睜睁碼码礙碍禍祸穀谷"
+    "窗窗竊窃筍笋範范籃篮籤签級级納纳紙纸紛纷純纯絕绝絡络綁绑綱纲緩缓緬缅縮缩織织繪绘纖纤罷罢"
+    "義义羅罗膽胆膚肤臉脸艦舰艱艰芻刍蘋苹蝦虾螢萤衆众襪袜覆覆規规訂订訓训託托記记訴诉診诊詐诈"
+    "詠咏誕诞誘诱語语誰谁諾诺謊谎謎谜謹谨譜谱讀读豈岂貞贞貫贯賊贼賬账賠赔賜赐賞赏賢贤賤贱趨趋"
+    "跡迹踐践躍跃軀躯輛辆輩辈轎轿辯辩遞递遜逊遲迟遷迁釋释鈔钞鈴铃鉛铅銅铜鋒锋鋪铺錦锦錯错鍋锅"
+    "鍛锻鎖锁鏈链鑰钥閃闪閣阁閩闽闊阔闖闯阪阪陣阵陰阴隱隐隸隶雇雇電电霧雾靈灵韋韦韻韵頌颂預预"
+    "頑顽頒颁頓顿頗颇頸颈頻频顆颗顛颠颱台飄飘飢饥飼饲飽饱餅饼館馆騎骑騙骗騰腾驕骄驢驴鬧闹魯鲁"
+    "鮮鲜鯨鲸鳳凤鳴鸣鴨鸭鴻鸿鵝鹅鶴鹤鹽盐麵面黴霉鼓鼓齣出亞亚"
+)
+TRAD_TO_SIMP = {
+    t: s for t, s in zip(_PAIRS[0::2], _PAIRS[1::2]) if t != s
+}
+
+# simplified forms that are also ordinary traditional characters (not a script signal)
+_SHARED = set("于只里干松板制志周向余征斗后范冲台出面谷托症咏迹")
+
+TRADITIONAL_ONLY = set(TRAD_TO_SIMP)
+SIMPLIFIED_ONLY = set(TRAD_TO_SIMP.values()) - _SHARED - TRADITIONAL_ONLY
+
+# punctuation folded for lookups: full-width ASCII, CJK brackets, interpunct variants
+_PUNCT = {chr(c): chr(c - 0xFEE0) for c in range(0xFF01, 0xFF5F)}
+_PUNCT.update({
+    "\u3000": " ",
+    "【": "[", "】": "]", "〔": "[", "〕": "]", "〖": "[", "〗": "]",
+    "•": "·", "‧": "·", "・": "·", "･": "·", "∙": "·", "⋅": "·", "●": "·",
+    "—": "-", "–": "-", "‐": "-", "‑": "-",
+})
+_FOLD_TABLE = str.maketrans({**_PUNCT, **TRAD_TO_SIMP})
+
+_BRACKETED = re.compile(r"\([^()]*\)|\[[^\[\]]*\]")
+_AROUND_DOT = re.compile(r"\s*·\s*")
+_SPACES = re.compile(r"\s+")
+
+
+def fold_chars(text: str) -> str:
+    """
+    Character-by-character folding (traditional → simplified, punctuation
+    and interpunct variants unified). Keeps the length, so match positions
+    in the folded text are valid in the original.
+    """
+    return str(text).translate(_FOLD_TABLE)
+
+
+def fold(text: str) -> str:
+    """
+    Lookup key for glossary matching: normalize + fold_chars, bracketed
+    metadata such as "(SG)" or "【旧称】" removed, and spacing around
+    interpuncts in transliterated names collapsed.
+    """
+    folded = fold_chars(normalize(text))
+    stripped = _BRACKETED.sub("", folded)
+    # a term that is nothing but brackets keeps its content
+    folded = stripped if stripped.strip() else folded
+    folded = _AROUND_DOT.sub("·", folded)
+    return _SPACES.sub(" ", folded).strip()
+
+
+# CJK unified ideographs (basic block + extension A)
+_HAN = re.compile(r"[㐀-䶿一-鿿]")
+# word units: each Han character, or a whole run of other letters ("National", "NUS")
+_WORD = re.compile(r"[㐀-䶿一-鿿]|(?:(?![㐀-䶿一-鿿])[^\W\d_])+")
+
+# share of word units that must be Han for the text to count as Mandarin
+MIN_HAN_RATIO = 0.3
+
+# minority script share above which the text is reported as mixed
+MIXED_RATIO = 0.1
+
+
+def contains_chinese(text: str) -> bool:
+    """Return True if the text has at least one Han character."""
+    return bool(_HAN.search(str(text)))
+
+
+def detect_script(text: str) -> str:
+    """Return "simplified", "traditional" or "mixed" for a Chinese text."""
+    trad = sum(1 for ch in text if ch in TRADITIONAL_ONLY)
+    simp = sum(1 for ch in text if ch in SIMPLIFIED_ONLY)
+    if trad == 0 and simp == 0:
+        # only characters shared by both scripts
+        return "simplified"
+    minority = min(trad, simp) / (trad + simp)
+    if minority > MIXED_RATIO:
+        return "mixed"
+    return "traditional" if trad > simp else "simplified"
+
+
+#local replacement for the task_lang_check LLM agent
+def check_language(text: str) -> dict:
+    """
+    Deterministic language and script check.
+    Returns the same JSON shape as task_lang_check:
+    {"status":"ok","detected_language":"zh","script":"simplified|traditional|mixed"}
+    or {"status":"error","detected_language":"<code>","message":"non-Mandarin input"}
+    """
+    words = _WORD.findall(text)
+    han = sum(1 for w in words if _HAN.match(w))
+
+    if words and han / len(words) >= MIN_HAN_RATIO:
+        return {"status": "ok", "detected_language": "zh", "script": detect_script(text)}
+
+    try:
+        code = detect(text)
+    except LangDetectException:
+        code = "unknown"
+    return {"status": "error", "detected_language": code, "message": "non-Mandarin input"}
+
+
+def check_language_json(text: str) -> str:
+    """check_language as a one-line JSON string (the format the agents expect)."""
+    return json.dumps(check_language(text), ensure_ascii=False)
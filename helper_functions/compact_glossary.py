@@ -0,0 +1,233 @@
+# Import
+import os
+import mmap
+import struct
+import hashlib
+import threading
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+# directory for memory-mappable glossary files (shared by worker processes); unset = in-memory only
+MMAP_DIR = os.environ.get("GLOSSARY_MMAP_DIR", "")
+
+_MAGIC = b"TTGLOS1\0"
+_HEADER = struct.Struct("<8sI")
+
+#immutable, compact glossary: sorted keys + offsets into one UTF-8 buffer
+class CompactGlossary:
+    """
+    Read-only {normalized chinese: english} map stored as two UTF-8 byte
+    buffers with uint32 offset arrays, keys sorted by their UTF-8 bytes.
+    Lookups are binary searches. The same layout is written to disk so it
+    can be memory-mapped and shared by several worker processes.
+    """
+
+    def __init__(self, key_offsets, keys, value_offsets, values, _mmap=None):
+        self._key_offsets = key_offsets
+        self._keys = keys
+        self._value_offsets = value_offsets
+        self._values = values
+        self._mmap = _mmap
+        self._n = len(key_offsets) - 1
+
+    @classmethod
+    def build(cls, pairs):
+        """Build from (key, english) pairs; for duplicate keys the last one wins."""
+        latest = {}
+        for key, value in pairs:
+            if key:
+                latest[key.encode("utf-8")] = str(value).encode("utf-8")
+        ordered = sorted(latest)
+
+        key_offsets, value_offsets = array("I", [0]), array("I", [0])
+        keys, values = bytearray(), bytearray()
+        for k in ordered:
+            keys += k
+            values += latest[k]
+            key_offsets.append(len(keys))
+            value_offsets.append(len(values))
+        return cls(key_offsets, bytes(keys), value_offsets, bytes(values))
+
+    def __len__(self):
+        return self._n
+
+    def _key(self, i):
+        return bytes(self._keys[self._key_offsets[i]:self._key_offsets[i + 1]])
+
+    def _value(self, i):
+        return bytes(self._values[self._value_offsets[i]:self._value_offsets[i + 1]]).decode("utf-8")
+
+    def get(self, key, default=None):
+        if not key:
+            return default
+        k = key.encode("utf-8")
+        i = bisect_left(range(self._n), k, key=self._key)
+        if i < self._n and self._key(i) == k:
+            return self._value(i)
+        return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def items(self):
+        for i in range(self._n):
+            yield self._key(i).decode("utf-8"), self._value(i)
+
+    def digest(self):
+        """Content hash (keys and values), used to name the memory-mapped files."""
+        h = hashlib.sha1()
+        for part in (self._key_offsets, self._keys, self._value_offsets, self._values):
+            h.update(part)
+        return h.hexdigest()[:16]
+
+    #on-disk layout: header, key offsets, value offsets, key bytes, value bytes
+    def save(self, path):
+        """Write atomically (temp file + rename) so readers never see a partial file."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self._n))
+            f.write(self._key_offsets.tobytes())
+            f.write(self._value_offsets.tobytes())
+            f.write(self._keys)
+            f.write(self._values)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a saved glossary; pages are shared between processes."""
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mm)
+        magic, n = _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a compact glossary file")
+        pos = _HEADER.size
+        key_offsets = view[pos:pos + 4 * (n + 1)].cast("I")
+        pos += 4 * (n + 1)
+        value_offsets = view[pos:pos + 4 * (n + 1)].cast("I")
+        pos += 4 * (n + 1)
+        keys = view[pos:pos + key_offsets[n]]
+        pos += key_offsets[n]
+        values = view[pos:pos + value_offsets[n]]
+        return cls(key_offsets, keys, value_offsets, values, _mmap=mm)
+
+
+#memory-mapped files, one per glossary version and content
+def mmap_path(prefix, version, digest):
+    """
+    File for one version of a shared structure. The content digest is part of
+    the name, so a version counter that restarts (e.g. a recreated SQLite
+    database) never picks up a stale file with different content.
+    """
+    Path(MMAP_DIR).mkdir(parents=True, exist_ok=True)
+    name = hashlib.sha1(f"{version}\x1f{digest}".encode("utf-8")).hexdigest()[:16]
+    return Path(MMAP_DIR) / f"{prefix}-{name}.bin"
+
+def remove_superseded(prefix, keep):
+    """
+    Delete the other files of this kind once a new one is in use. Processes
+    that still map an old file keep their pages (the mapping outlives the
+    name); a process that needs it again rebuilds it.
+    """
+    for path in Path(MMAP_DIR).glob(f"{prefix}-*.bin"):
+        if path != keep:
+            try:
+                path.unlink()
+            except OSError:
+                pass  # already removed, or still locked on platforms without unlink-while-open
+
+
+#one shared instance per process, swapped atomically when the glossary version changes
+_lock = threading.Lock()
+_current = (None, None)   # (version, CompactGlossary)
+
+def get_compact_glossary(version, pairs_fn):
+    """
+    Return the shared CompactGlossary for this version. pairs_fn() supplies
+    (key, english) pairs and is only called when the version is new.
+    With GLOSSARY_MMAP_DIR set, the glossary is written once per version and
+    content and memory-mapped, so every worker process maps the same file;
+    files of superseded versions are deleted.
+    """
+    global _current
+    current_version, glossary = _current
+    if current_version == version and glossary is not None:
+        return glossary
+
+    with _lock:
+        current_version, glossary = _current
+        if current_version == version and glossary is not None:
+            return glossary
+
+        glossary = CompactGlossary.build(pairs_fn())
+        if MMAP_DIR:
+            path = mmap_path("glossary", version, glossary.digest())
+            if not path.exists():
+                glossary.save(path)
+            try:
+                glossary = CompactGlossary.load(path)
+                remove_superseded("glossary", path)
+            except FileNotFoundError:
+                pass  # removed by another process meanwhile; keep the in-memory copy
+
+        # single assignment: readers see either the old or the new glossary
+        _current = (version, glossary)
+        return glossary
+
+
+#memory report (python -m helper_functions.compact_glossary)
+def _memory_report(n=10_000):
+    """
+    Per-process glossary memory for n terms, counting every structure a worker
+    keeps, not only the lookup buffer, next to the per-session DataFrame + dict
+    it replaced. The snapshot DataFrame is only held by
+    the Dropbox backend (GlossaryCache); the SQLite backend does not keep it.
+    """
+    import io
+    import random
+    import tracemalloc
+    import pandas as pd
+    from helper_functions.glossary_matcher import GlossaryMatcher
+    from helper_functions.ngram_index import NgramIndex
+
+    random.seed(0)
+    alphabet = [chr(c) for c in range(0x4e00, 0x4e00 + 3000)]
+    lines = ["chinese,english"] + [
+        "".join(random.choice(alphabet) for _ in range(random.randint(2, 8)))
+        + "," + " ".join(random.choice(["Ministry", "of", "Health", "Singapore", "Association"]) for _ in range(random.randint(1, 5)))
+        for _ in range(n)
+    ]
+    csv_text = "\n".join(lines)
+
+    def traced(build):
+        tracemalloc.start()
+        obj = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return obj, size
+
+    # before: what every session/run kept - DataFrame + Python dict
+    def per_session():
+        frame = pd.read_csv(io.StringIO(csv_text))
+        return frame, dict(zip(frame["chinese"], frame["english"]))
+
+    _, before = traced(per_session)
+
+    df, df_size = traced(lambda: pd.read_csv(io.StringIO(csv_text)))
+    compact, compact_size = traced(lambda: CompactGlossary.build(zip(df["chinese"], df["english"])))
+    _, matcher_size = traced(lambda: GlossaryMatcher(compact))
+    _, index_size = traced(lambda: NgramIndex(compact))
+
+    total = compact_size + matcher_size + index_size
+    print(f"{n:,} terms ({len(compact)} keys)")
+    print(f"before, per session: DataFrame + dict {before / 1e6:6.2f} MB")
+    print("after, per process (shared by all sessions):")
+    print(f"  compact glossary  {compact_size / 1e6:6.2f} MB   (shared via mmap with GLOSSARY_MMAP_DIR)")
+    print(f"  matcher           {matcher_size / 1e6:6.2f} MB   (shared via mmap with GLOSSARY_MMAP_DIR)")
+    print(f"  n-gram index      {index_size / 1e6:6.2f} MB   (built on the first near-match lookup)")
+    print(f"  total             {total / 1e6:6.2f} MB   (+ {df_size / 1e6:.2f} MB snapshot DataFrame on the Dropbox backend)")
+
+
+if __name__ == "__main__":
+    _memory_report()
@@ -2,15 +2,42 @@ import dropbox
 from io import BytesIO
 import pandas as pd
 import streamlit as st
-from helper_functions.dropbox_auth import get_fresh_access_token
+import threading
+import functools
+from helper_functions.dropbox_auth import get_cached_access_token, invalidate_access_token
+
+# shared HTTP connection pool for all Dropbox API calls
+_dbx_session = dropbox.create_session(max_connections=8)
+_dbx_lock = threading.Lock()
+_dbx_client = {"token": None, "client": None}
 
 
 def get_dbx():
-    """Initialize Dropbox client using a fresh access token."""
-    access_token = get_fresh_access_token()  
-    return dropbox.Dropbox(access_token)
+    """Return the shared Dropbox client, rebuilt only when the access token changes."""
+    access_token = get_cached_access_token()
+    with _dbx_lock:
+        if _dbx_client["token"] != access_token:
+            _dbx_client["client"] = dropbox.Dropbox(access_token, session=_dbx_session)
+            _dbx_client["token"] = access_token
+        return _dbx_client["client"]
+
 
+def retry_on_auth_error(fn):
+    """
+    Run a Dropbox call; if the cached token is rejected (revoked or expired
+    early), drop it, fetch a new one and try once more.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except dropbox.exceptions.AuthError:
+            invalidate_access_token()
+            return fn(*args, **kwargs)
+    return wrapper
 
+
+@retry_on_auth_error
 def read_csv_from_dropbox(path="/Apps/TongTranslate/Resources/glossary.csv"):
     """Read a CSV file from Dropbox and return a pandas DataFrame."""
     dbx = get_dbx()
@@ -20,14 +47,88 @@ def read_csv_from_dropbox(path="/Apps/TongTranslate/Resources/glossary.csv"):
     return df
 
 
-def write_csv_to_dropbox(df, path="/Apps/TongTranslate/Resources/glossary.csv"):
-    """Write (overwrite) a pandas DataFrame to Dropbox as CSV."""
+@retry_on_auth_error
+def read_csv_with_rev(path="/Apps/TongTranslate/Resources/glossary.csv"):
+    """Read a CSV file from Dropbox and return (DataFrame, rev, size in bytes)."""
+    dbx = get_dbx()
+    metadata, response = dbx.files_download(path)
+    data = response.content
+    df = pd.read_csv(BytesIO(data), encoding="utf-8-sig")
+    return df, metadata.rev, len(data)
+
+
+@retry_on_auth_error
+def get_rev(path="/Apps/TongTranslate/Resources/glossary.csv"):
+    """Cheap metadata call returning the current revision of a Dropbox file."""
+    dbx = get_dbx()
+    return dbx.files_get_metadata(path).rev
+
+
+class WriteConflict(Exception):
+    """The file changed on Dropbox since the revision the writer read."""
+
+
+@retry_on_auth_error
+def write_csv_to_dropbox(df, path="/Apps/TongTranslate/Resources/glossary.csv", rev=None):
+    """
+    Write (overwrite) a pandas DataFrame to Dropbox as CSV. Returns the new file metadata.
+    If rev is given, the write only succeeds while the file is still at that
+    revision; otherwise WriteConflict is raised.
+    """
     dbx = get_dbx()
     buffer = BytesIO()
     df.to_csv(buffer, index=False, encoding="utf-8-sig")
     buffer.seek(0)
-    dbx.files_upload(
+    mode = dropbox.files.WriteMode.update(rev) if rev else dropbox.files.WriteMode.overwrite
+    try:
+        return dbx.files_upload(
+            buffer.read(),
+            path,
+            mode=mode
+        )
+    except dropbox.exceptions.ApiError as e:
+        err = e.error
+        if rev and err.is_path() and err.get_path().reason.is_conflict():
+            raise WriteConflict(path) from e
+        raise
+
+
+@retry_on_auth_error
+def list_csv_files(folder):
+    """List the CSV files in a Dropbox folder, sorted by name. Missing folder -> []."""
+    dbx = get_dbx()
+    try:
+        result = dbx.files_list_folder(folder)
+    except dropbox.exceptions.ApiError:
+        return []
+    entries = list(result.entries)
+    while result.has_more:
+        result = dbx.files_list_folder_continue(result.cursor)
+        entries += result.entries
+    names = sorted(e.name for e in entries if e.name.endswith(".csv"))
+    return [f"{folder}/{name}" for name in names]
+
+
+@retry_on_auth_error
+def upload_new_csv(df, path):
+    """Upload a DataFrame as a new CSV file (fails if the path already exists)."""
+    dbx = get_dbx()
+    buffer = BytesIO()
+    df.to_csv(buffer, index=False, encoding="utf-8-sig")
+    buffer.seek(0)
+    return dbx.files_upload(
         buffer.read(),
         path,
-        mode=dropbox.files.WriteMode.overwrite
+        mode=dropbox.files.WriteMode.add
     )
+
+
+@retry_on_auth_error
+def delete_files(paths):
+    """Delete Dropbox files; files that are already gone are ignored."""
+    dbx = get_dbx()
+    for path in paths:
+        try:
+            dbx.files_delete_v2(path)
+        except dropbox.exceptions.ApiError:
+            pass
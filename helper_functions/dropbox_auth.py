@@ -1,15 +1,52 @@
 import requests
 import streamlit as st
 import os
+import threading
+import time
+
+# token endpoint can be pointed at a local stand-in for testing
+TOKEN_URL = os.environ.get("DROPBOX_TOKEN_URL", "https://api.dropbox.com/oauth2/token")
+
+# refresh this many seconds before the token actually expires
+EXPIRY_MARGIN = 300
+
+# one pooled HTTP session for all token requests
+_session = requests.Session()
+
+_token_lock = threading.Lock()
+_token_cache = {"access_token": None, "expires_at": 0.0}
 
 def get_fresh_access_token():
-    url = "https://api.dropbox.com/oauth2/token"
+    url = TOKEN_URL
     data = {
         "grant_type": "refresh_token",
         "refresh_token": os.environ["DROPBOX_REFRESH_TOKEN"],
         "client_id": os.environ["DROPBOX_APP_KEY"],
         "client_secret": os.environ["DROPBOX_APP_SECRET"],
     }
-    response = requests.post(url, data=data)
+    response = _session.post(url, data=data, timeout=30)
     response.raise_for_status()
-    return response.json()["access_token"]
\ No newline at end of file
+    payload = response.json()
+    _token_cache["expires_at"] = time.time() + float(payload.get("expires_in", 14400))
+    _token_cache["access_token"] = payload["access_token"]
+    return payload["access_token"]
+
+def get_cached_access_token():
+    """
+    Return a cached access token, refreshing it only when it is about to expire.
+    Concurrent callers wait on one lock so only a single refresh request is sent.
+    """
+    if _token_cache["access_token"] and time.time() < _token_cache["expires_at"] - EXPIRY_MARGIN:
+        return _token_cache["access_token"]
+
+    with _token_lock:
+        # another thread may have refreshed while we were waiting
+        if _token_cache["access_token"] and time.time() < _token_cache["expires_at"] - EXPIRY_MARGIN:
+            return _token_cache["access_token"]
+        return get_fresh_access_token()
+
+def invalidate_access_token():
+    """Force the next call to fetch a new token (e.g. after an auth error)."""
+    with _token_lock:
+        _token_cache["access_token"] = None
+        _token_cache["expires_at"] = 0.0
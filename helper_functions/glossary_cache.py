@@ -0,0 +1,251 @@
+# Import
+import os
+import time
+import uuid
+import hashlib
+import threading
+import pandas as pd
+from helper_functions.dropbox import (
+    read_csv_with_rev, get_rev, write_csv_to_dropbox, list_csv_files, upload_new_csv, delete_files,
+    WriteConflict
+)
+from helper_functions.chinese_script import normalize
+from helper_functions.glossary_store import rows_by_key, three_way_merge
+
+# fold deltas into a new snapshot once this many have accumulated
+COMPACT_AFTER = int(os.environ.get("GLOSSARY_COMPACT_AFTER", 20))
+
+# status used in delta rows to mark a deleted term
+TOMBSTONE = "DELETED"
+
+# attempts for conditional (rev-based) glossary writes
+MAX_WRITE_ATTEMPTS = 5
+
+#process-wide glossary cache keyed by the Dropbox file revision
+class GlossaryCache:
+    """
+    Keeps one copy of each glossary DataFrame in memory per Dropbox path.
+    A cheap metadata call checks the file `rev`; the CSV is downloaded again
+    only when the revision has changed. Writes made through this cache update
+    the cached copy in place, so the next read does not re-download.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # path -> {"df": DataFrame, "rev": str, "size": int}
+        self._deltas = {}   # delta path -> DataFrame (delta files never change)
+        self.hits = 0
+        self.misses = 0
+        self.bytes_avoided = 0
+
+    def read(self, path):
+        """Return (DataFrame copy, rev) for path, downloading only on a new revision."""
+        rev = get_rev(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry["rev"] == rev:
+                self.hits += 1
+                self.bytes_avoided += entry["size"]
+                return entry["df"].copy(), rev
+
+        df, rev, size = read_csv_with_rev(path)
+        with self._lock:
+            self.misses += 1
+            self._entries[path] = {"df": df, "rev": rev, "size": size}
+        return df.copy(), rev
+
+    def read_delta(self, path):
+        """Delta files are immutable, so each one is downloaded at most once."""
+        with self._lock:
+            entry = self._deltas.get(path)
+            if entry is not None:
+                self.hits += 1
+                self.bytes_avoided += entry["size"]
+                return entry["df"]
+
+        df, _, size = read_csv_with_rev(path)
+        with self._lock:
+            self.misses += 1
+            self._deltas[path] = {"df": df, "size": size}
+        return df
+
+    def forget_deltas(self, paths):
+        with self._lock:
+            for path in paths:
+                self._deltas.pop(path, None)
+
+    def write(self, df, path, rev=None):
+        """
+        Upload df to path and keep the uploaded copy as the cached revision.
+        With rev, the upload is conditional (WriteConflict if the file moved on).
+        """
+        metadata = write_csv_to_dropbox(df, path, rev=rev)
+        with self._lock:
+            size = getattr(metadata, "size", 0)
+            self._entries[path] = {"df": df.copy(), "rev": metadata.rev, "size": size}
+        return metadata
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes_avoided": self.bytes_avoided,
+            }
+
+
+#shared instance used by the pipeline and the Streamlit pages
+glossary_cache = GlossaryCache()
+
+#glossary = base snapshot + small append-only delta files
+def delta_folder(path):
+    """Folder holding the delta files of a glossary snapshot."""
+    return path.rsplit(".", 1)[0] + "_deltas"
+
+def merge_rows(frames):
+    """
+    Merge snapshot and deltas in order. The last row per normalized Chinese
+    key wins, and tombstone rows remove the term.
+    """
+    frames = [f for f in frames if f is not None and len(f)]
+    if not frames:
+        return pd.DataFrame(columns=["chinese", "english", "status", "source", "links"])
+    df = pd.concat(frames, ignore_index=True)
+    keys = df["chinese"].fillna("").map(normalize)
+    df = df[keys != ""]
+    keys = keys[keys != ""]
+    df = df.loc[~keys.duplicated(keep="last")]
+    df = df[df.get("status", pd.Series(index=df.index, dtype=object)).fillna("") != TOMBSTONE]
+    return df.reset_index(drop=True)
+
+def _read_log(path):
+    """Returns (merged DataFrame, version, delta paths, snapshot rev)."""
+    base, base_rev = glossary_cache.read(path)
+    deltas = list_csv_files(delta_folder(path))
+    merged = merge_rows([base] + [glossary_cache.read_delta(d) for d in deltas])
+    return merged, _version(base_rev, deltas), deltas, base_rev
+
+def _version(base_rev, deltas):
+    return hashlib.sha1("|".join([base_rev] + deltas).encode("utf-8")).hexdigest()[:16]
+
+def glossary_version(path="/Resources/glossary.csv"):
+    """Version of snapshot + deltas from metadata only (nothing is downloaded)."""
+    return _version(get_rev(path), list_csv_files(delta_folder(path)))
+
+def read_glossary(path="/Resources/glossary.csv"):
+    """Cached glossary read (snapshot merged with deltas). Returns a DataFrame."""
+    df, _, _, _ = _read_log(path)
+    return df
+
+def read_glossary_with_rev(path="/Resources/glossary.csv"):
+    """Cached glossary read. Returns (DataFrame, version of snapshot + deltas)."""
+    df, version, _, _ = _read_log(path)
+    return df, version
+
+def write_glossary(df, path="/Resources/glossary.csv"):
+    """Write a full snapshot and refresh the cache in place."""
+    return glossary_cache.write(df, path)
+
+def _delta_name():
+    """Unique, time-sortable delta file name."""
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{time.time_ns() % 10**9:09d}-{uuid.uuid4().hex[:8]}.csv"
+
+def append_glossary_rows(rows, path="/Resources/glossary.csv"):
+    """
+    Write new or changed rows as one small delta file: O(new rows), not O(glossary).
+    Use status=TOMBSTONE to delete a term. Compacts once enough deltas pile up.
+    """
+    if rows is None or len(rows) == 0:
+        return None
+    metadata = upload_new_csv(rows, f"{delta_folder(path)}/{_delta_name()}")
+
+    if len(list_csv_files(delta_folder(path))) >= COMPACT_AFTER:
+        compact_glossary(path)
+    return metadata
+
+#compaction job - fold deltas into a new snapshot (python -m helper_functions.glossary_cache)
+def compact_glossary(path="/Resources/glossary.csv"):
+    """
+    Merge the snapshot with every current delta, write the result as the new
+    snapshot (duplicates by normalized key removed), then delete those deltas.
+    The snapshot write is conditional on the rev that was read; if another
+    compaction got there first, re-read and try again.
+    Deltas written while compacting are left for the next run.
+    """
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        merged, _, deltas, base_rev = _read_log(path)
+        if not deltas:
+            return 0
+        try:
+            glossary_cache.write(merged, path, rev=base_rev)
+        except WriteConflict:
+            print(f"↪️ Glossary snapshot changed during compaction, retrying ({attempt + 1}/{MAX_WRITE_ATTEMPTS})")
+            glossary_cache.invalidate(path)
+            continue
+        delete_files(deltas)
+        glossary_cache.forget_deltas(deltas)
+        print(f"🗜️ Glossary compacted: {len(deltas)} delta file(s) folded into {path}")
+        return len(deltas)
+    raise WriteConflict(path)
+
+#optimistic-concurrency save for edited glossary tables
+def save_glossary_edits(base_df, edited_df, columns, path="/Resources/glossary.csv", extra=None):
+    """
+    Save a user's edits made against base_df (the glossary as they loaded it).
+    Re-reads the current glossary, three-way merges only the rows the user
+    changed, and writes them as one delta. If another session wrote a delta
+    in the meantime, merges again against their change and writes a newer
+    delta (bounded retries), so neither session's edits are lost.
+    Returns the list of keys that were edited on both sides.
+    """
+    base = rows_by_key(base_df, columns)
+    ours = rows_by_key(edited_df, columns)
+    changed = [k for k in base.keys() | ours.keys() if base.get(k) != ours.get(k)]
+    if not changed:
+        return []
+
+    own = []    # delta files written by this save
+    all_conflicts = set()
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        # current state as other sessions left it (our own deltas excluded)
+        snapshot, _ = glossary_cache.read(path)
+        seen = list_csv_files(delta_folder(path))
+        current = merge_rows([snapshot] + [glossary_cache.read_delta(d) for d in seen if d not in own])
+        theirs = rows_by_key(current, columns)
+
+        merged, conflicts = three_way_merge(base, ours, theirs, changed)
+        all_conflicts.update(conflicts)
+
+        rows = []
+        for k, row in merged.items():
+            if row is None:
+                rows.append({"chinese": base[k]["chinese"], "status": TOMBSTONE, **(extra or {})})
+            else:
+                rows.append({**row, **(extra or {})})
+        # tombstones first, so a renamed key is removed before its new row lands
+        rows.sort(key=lambda r: r.get("status") != TOMBSTONE)
+
+        delta_path = f"{delta_folder(path)}/{_delta_name()}"
+        upload_new_csv(pd.DataFrame(rows), delta_path)
+        own.append(delta_path)
+
+        # did another session write a delta while we were merging?
+        others = [d for d in list_csv_files(delta_folder(path)) if d not in seen and d not in own]
+        if not others:
+            break
+        print(f"↪️ Concurrent glossary write detected, re-merging ({attempt + 1}/{MAX_WRITE_ATTEMPTS})")
+
+    if len(list_csv_files(delta_folder(path))) >= COMPACT_AFTER:
+        compact_glossary(path)
+    return sorted(all_conflicts)
+
+
+if __name__ == "__main__":
+    compact_glossary()
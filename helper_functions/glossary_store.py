@@ -0,0 +1,304 @@
+# Import
+import os
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+import pandas as pd
+from helper_functions.chinese_script import normalize
+
+# which backend get_glossary_store() returns: "dropbox" or "sqlite"
+GLOSSARY_BACKEND = os.environ.get("GLOSSARY_BACKEND", "dropbox")
+
+# local SQLite database, seeded on first use from the live Dropbox glossary
+# (when Dropbox credentials are set) or else from the bundled CSV
+SQLITE_PATH = os.environ.get("GLOSSARY_SQLITE_PATH", "cache/glossary.sqlite")
+SEED_CSV = os.environ.get("GLOSSARY_SEED_CSV", "Resources/glossary.csv")
+
+# also push SQLite writes to Dropbox (as delta files) when set to "1".
+# Sync is push-only: edits made directly on Dropbox after seeding are not pulled back
+DROPBOX_SYNC = os.environ.get("GLOSSARY_DROPBOX_SYNC", "0") == "1"
+
+# environment needed to reach Dropbox (see dropbox_auth)
+DROPBOX_ENV = ("DROPBOX_REFRESH_TOKEN", "DROPBOX_APP_KEY", "DROPBOX_APP_SECRET")
+
+COLUMNS = ["chinese", "english", "status", "source", "links", "edited", "last_modified"]
+
+#row-level merge helpers shared by every backend
+def rows_by_key(df, columns):
+    """{normalized chinese: row dict} for the given columns."""
+    df = df.reindex(columns=columns).fillna("")
+    return {normalize(r["chinese"]): r for r in df.to_dict("records") if normalize(r["chinese"])}
+
+def three_way_merge(base: dict, ours: dict, theirs: dict, keys):
+    """
+    Row-level three-way merge keyed by normalized chinese (None = row deleted).
+    For each key changed by us: if they did not touch it, ours wins; if both
+    edited it, fields merge column by column (our edited fields win).
+    Returns ({key: merged row or None}, [conflicting keys]).
+    """
+    merged, conflicts = {}, []
+    for k in keys:
+        b, o, t = base.get(k), ours.get(k), theirs.get(k)
+        if t == b or t == o:
+            merged[k] = o
+        elif o is None or t is None or b is None:
+            # delete vs edit (or both added the same key): keep our version
+            merged[k] = o
+            conflicts.append(k)
+        else:
+            row = {}
+            for col in o:
+                ours_changed = o[col] != b.get(col)
+                theirs_changed = t.get(col) != b.get(col)
+                if ours_changed and theirs_changed and o[col] != t.get(col):
+                    conflicts.append(k)
+                row[col] = o[col] if ours_changed else t.get(col, o[col])
+            merged[k] = row
+    return merged, sorted(set(conflicts))
+
+#storage interface used by map_glossary and the Glossary page
+class GlossaryStore(ABC):
+    """Where the glossary lives. Rows are dicts with the COLUMNS fields."""
+
+    path = "/Resources/glossary.csv"
+
+    @abstractmethod
+    def version(self) -> str:
+        """Changes whenever the glossary content changes."""
+
+    @abstractmethod
+    def read_all(self) -> pd.DataFrame:
+        """Whole glossary as a DataFrame."""
+
+    def read_with_version(self):
+        """(DataFrame, version) in one go."""
+        return self.read_all(), self.version()
+
+    @abstractmethod
+    def get(self, chinese_terms) -> dict:
+        """Point lookups: {normalized chinese: row} for the terms that exist."""
+
+    @abstractmethod
+    def upsert(self, rows) -> int:
+        """Insert or replace rows (keyed by normalized chinese). Returns rows written."""
+
+    @abstractmethod
+    def scan(self, offset=0, limit=500) -> list:
+        """One page of rows in insertion order."""
+
+    @abstractmethod
+    def save_edits(self, base_df, edited_df, columns, extra=None) -> list:
+        """Save edits made against base_df; returns keys edited concurrently by others."""
+
+
+#Dropbox backend - snapshot + deltas with the revision-aware cache
+class DropboxGlossaryStore(GlossaryStore):
+
+    def __init__(self, path="/Resources/glossary.csv"):
+        self.path = path
+
+    def version(self):
+        from helper_functions.glossary_cache import glossary_version
+        return glossary_version(self.path)
+
+    def read_all(self):
+        from helper_functions.glossary_cache import read_glossary
+        return read_glossary(self.path)
+
+    def read_with_version(self):
+        from helper_functions.glossary_cache import read_glossary_with_rev
+        return read_glossary_with_rev(self.path)
+
+    def get(self, chinese_terms):
+        wanted = {normalize(t) for t in chinese_terms}
+        rows = self.read_all().fillna("").to_dict("records")
+        return {normalize(r["chinese"]): r for r in rows if normalize(r["chinese"]) in wanted}
+
+    def upsert(self, rows):
+        from helper_functions.glossary_cache import append_glossary_rows
+        rows = list(rows)
+        if rows:
+            append_glossary_rows(pd.DataFrame(rows), self.path)
+        return len(rows)
+
+    def scan(self, offset=0, limit=500):
+        return self.read_all().iloc[offset:offset + limit].fillna("").to_dict("records")
+
+    def save_edits(self, base_df, edited_df, columns, extra=None):
+        from helper_functions.glossary_cache import save_glossary_edits
+        return save_glossary_edits(base_df, edited_df, columns, self.path, extra=extra)
+
+
+#local SQLite backend - indexed on normalized chinese, works offline
+class SQLiteGlossaryStore(GlossaryStore):
+    """
+    Glossary in a local SQLite file. An empty database is seeded once from
+    the live Dropbox glossary, or from seed_csv without Dropbox credentials.
+    With sync_to_dropbox, local writes are pushed to Dropbox as deltas;
+    the sync is one-way, so later edits made on Dropbox are not seen here.
+    """
+
+    def __init__(self, db_path=SQLITE_PATH, seed_csv=SEED_CSV, sync_to_dropbox=DROPBOX_SYNC):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.sync_to_dropbox = sync_to_dropbox
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS glossary (
+                   key TEXT PRIMARY KEY,
+                   chinese TEXT NOT NULL,
+                   english TEXT, status TEXT, source TEXT, links TEXT,
+                   edited TEXT, last_modified TEXT,
+                   updated_at REAL
+               )"""
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('version', 0)")
+
+        empty = self._conn.execute("SELECT COUNT(*) FROM glossary").fetchone()[0] == 0
+        if empty:
+            self._seed(seed_csv)
+
+    def _seed(self, seed_csv):
+        """Fill an empty database from the live Dropbox glossary, else from the bundled CSV."""
+        seed, origin = None, None
+        if all(os.environ.get(v) for v in DROPBOX_ENV):
+            try:
+                seed, origin = DropboxGlossaryStore().read_all(), "Dropbox"
+            except Exception as e:
+                print(f"⚠️ Could not read the Dropbox glossary for seeding ({e}); using {seed_csv}")
+        if seed is None and seed_csv and Path(seed_csv).exists():
+            seed, origin = pd.read_csv(seed_csv, encoding="utf-8-sig"), seed_csv
+        if seed is not None:
+            seed = seed.fillna("")
+            self._write(seed.to_dict("records"), sync=False)
+            print(f"✅ SQLite glossary seeded with {len(seed)} rows from {origin}")
+
+    def _row(self, values):
+        return dict(zip(COLUMNS, values))
+
+    def _apply(self, rows, deletes=()):
+        """Upsert rows, delete keys and bump the version (caller holds a transaction)."""
+        now = time.time()
+        params = []
+        for r in rows:
+            key = normalize(r.get("chinese", ""))
+            if key:
+                params.append((key, str(r.get("chinese", "")).strip()) + tuple(
+                    "" if pd.isna(r.get(c, "")) else str(r.get(c, "")) for c in COLUMNS[1:]
+                ) + (now,))
+        # update in place on conflict so rows keep their position (rowid)
+        self._conn.executemany(
+            """INSERT INTO glossary VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(key) DO UPDATE SET
+                   chinese = excluded.chinese, english = excluded.english,
+                   status = excluded.status, source = excluded.source, links = excluded.links,
+                   edited = excluded.edited, last_modified = excluded.last_modified,
+                   updated_at = excluded.updated_at""",
+            params
+        )
+        self._conn.executemany("DELETE FROM glossary WHERE key = ?", [(k,) for k in deletes])
+        self._conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'version'")
+        return [dict(zip(COLUMNS, p[1:-1])) for p in params]
+
+    def _transaction(self, fn):
+        """Run fn() inside one write transaction (other writers wait)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def _sync(self, written, deletes=()):
+        """Optional replica: push the same change to Dropbox as a delta."""
+        if not self.sync_to_dropbox or not (written or deletes):
+            return
+        from helper_functions.glossary_cache import append_glossary_rows, TOMBSTONE
+        replica = list(written) + [{"chinese": k, "status": TOMBSTONE} for k in deletes]
+        append_glossary_rows(pd.DataFrame(replica))
+
+    def _write(self, rows, deletes=(), sync=True):
+        written = self._transaction(lambda: self._apply(rows, deletes))
+        if sync:
+            self._sync(written, deletes)
+        return len(written)
+
+    def _get_rows(self, keys):
+        found = {}
+        # stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            cur = self._conn.execute(
+                f"SELECT key, {', '.join(COLUMNS)} FROM glossary WHERE key IN ({', '.join('?' * len(part))})",
+                part,
+            )
+            for key, *values in cur.fetchall():
+                found[key] = self._row(values)
+        return found
+
+    def version(self):
+        with self._lock:
+            return str(self._conn.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()[0])
+
+    def read_all(self):
+        with self._lock:
+            cur = self._conn.execute(f"SELECT {', '.join(COLUMNS)} FROM glossary ORDER BY rowid")
+            return pd.DataFrame(cur.fetchall(), columns=COLUMNS)
+
+    def get(self, chinese_terms):
+        keys = list({normalize(t) for t in chinese_terms if normalize(t)})
+        with self._lock:
+            return self._get_rows(keys)
+
+    def upsert(self, rows):
+        return self._write(list(rows))
+
+    def scan(self, offset=0, limit=500):
+        with self._lock:
+            cur = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM glossary ORDER BY rowid LIMIT ? OFFSET ?",
+                (limit, offset),
+            )
+            return [self._row(v) for v in cur.fetchall()]
+
+    def save_edits(self, base_df, edited_df, columns, extra=None):
+        base = rows_by_key(base_df, columns)
+        ours = rows_by_key(edited_df, columns)
+        changed = [k for k in base.keys() | ours.keys() if base.get(k) != ours.get(k)]
+        if not changed:
+            return []
+
+        # read current rows, merge and write in one transaction - no lost updates
+        def merge_and_write():
+            theirs = {
+                k: {c: v for c, v in r.items() if c in columns}
+                for k, r in self._get_rows(changed).items()
+            }
+            merged, conflicts = three_way_merge(base, ours, theirs, changed)
+            rows = [{**row, **(extra or {})} for row in merged.values() if row is not None]
+            deletes = [k for k, row in merged.items() if row is None]
+            return self._apply(rows, deletes), deletes, conflicts
+
+        written, deletes, conflicts = self._transaction(merge_and_write)
+        self._sync(written, deletes)
+        return conflicts
+
+
+#shared store for the process
+_store = None
+_store_lock = threading.Lock()
+
+def get_glossary_store() -> GlossaryStore:
+    """Return the configured glossary backend (GLOSSARY_BACKEND)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SQLiteGlossaryStore() if GLOSSARY_BACKEND == "sqlite" else DropboxGlossaryStore()
+        return _store
@@ -0,0 +1,115 @@
+# Import
+import os
+import time
+import atexit
+import threading
+from helper_functions.map_glossary import normalize, append_to_glossary_csv
+
+# seconds between background flushes
+FLUSH_INTERVAL = float(os.environ.get("GLOSSARY_FLUSH_INTERVAL", 30))
+
+# flush early once this many distinct terms are waiting
+MAX_BATCH = int(os.environ.get("GLOSSARY_MAX_BATCH", 50))
+
+# attempts per flush, and flush cycles a term survives before it is dropped
+MAX_RETRIES = 3
+MAX_CYCLES = 5
+
+#write-behind queue for new glossary terms (Step 3)
+class GlossaryWriteBehind:
+    """
+    Collects new glossary terms from many pipeline runs and writes them to the
+    glossary store in the background, so translation does not wait on upload.
+    Terms are coalesced by normalized Chinese (the latest one wins) and flushed
+    in batches with bounded retry. Pending terms are flushed on shutdown.
+    """
+
+    def __init__(self, write_fn=append_to_glossary_csv, interval=FLUSH_INTERVAL, max_batch=MAX_BATCH):
+        self._write_fn = write_fn
+        self._interval = interval
+        self._max_batch = max_batch
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pending = {}   # normalized chinese -> term
+        self._cycles = {}    # normalized chinese -> failed flush cycles
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="glossary-write-behind", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, final_terms):
+        """Queue terms for the glossary. Returns immediately."""
+        with self._lock:
+            for term in final_terms:
+                key = normalize(term.get("chinese", ""))
+                if key:
+                    self._pending[key] = term
+            size = len(self._pending)
+        self.start()
+        if size >= self._max_batch:
+            self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Write all pending terms now. Terms that fail are kept for the next cycle."""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = {}
+            if not batch:
+                return 0
+
+            for attempt in range(1, MAX_RETRIES + 1):
+                try:
+                    self._write_fn(list(batch.values()))
+                    with self._lock:
+                        for key in batch:
+                            self._cycles.pop(key, None)
+                    return len(batch)
+                except Exception as ex:
+                    print(f"⚠️ Glossary flush failed (attempt {attempt}/{MAX_RETRIES}): {type(ex).__name__}")
+                    time.sleep(min(2 ** attempt, 10))
+
+            # give the terms back, unless they have failed too many cycles already
+            with self._lock:
+                for key, term in batch.items():
+                    self._cycles[key] = self._cycles.get(key, 0) + 1
+                    if self._cycles[key] >= MAX_CYCLES:
+                        print(f"❌ Dropping glossary term after {MAX_CYCLES} failed flushes: {key}")
+                        self._cycles.pop(key)
+                    else:
+                        self._pending.setdefault(key, term)
+            return 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self._interval)
+            self._wake.clear()
+            self.flush()
+
+    def shutdown(self, timeout=30):
+        """Stop the background thread and flush whatever is left."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+
+#shared queue, flushed when the process exits
+glossary_writer = GlossaryWriteBehind()
+atexit.register(glossary_writer.shutdown)
+
+def enqueue_glossary_terms(final_terms):
+    """Hand new terms to the background writer (replaces a blocking append)."""
+    glossary_writer.enqueue(final_terms)
+    print(f"🕒 {glossary_writer.pending()} glossary term(s) queued for background save")
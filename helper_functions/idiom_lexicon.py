@@ -0,0 +1,73 @@
+# Import
+import os
+import json
+import threading
+from pathlib import Path
+import pandas as pd
+from helper_functions.chinese_script import fold
+from helper_functions.glossary_matcher import GlossaryMatcher
+
+# bundled PETCI idiom resources (read-only)
+RESOURCES_DIR = Path(__file__).resolve().parent.parent / "Resources"
+IDIOM_CSV = Path(os.environ.get("IDIOM_CSV", RESOURCES_DIR / "filtered_verified.csv"))
+IDIOM_JSON = Path(os.environ.get("IDIOM_JSON", RESOURCES_DIR / "filtered (1).json"))
+
+# substring hits shorter than this are ignored (idioms are usually 4+ characters)
+MIN_SUBSTRING_LEN = 4
+
+#read-only idiom dictionary tier consulted after the editable glossary
+class IdiomLexicon:
+    """
+    Verified PETCI idioms with an exact index and a longest-substring matcher.
+    The CSV (verified gold translations) wins; the JSON adds idioms missing
+    from the CSV and keeps the human variants for reference.
+    """
+
+    def __init__(self, csv_path=IDIOM_CSV, json_path=IDIOM_JSON):
+        self.entries = {}  # folded chinese -> {"english", "variants"}
+
+        if Path(json_path).exists():
+            with open(json_path, encoding="utf-8") as f:
+                for item in json.load(f):
+                    key = fold(item.get("chinese", ""))
+                    if key and item.get("gold"):
+                        self.entries[key] = {
+                            "english": item["gold"],
+                            "variants": item.get("human", []),
+                        }
+
+        if Path(csv_path).exists():
+            df = pd.read_csv(csv_path, encoding="utf-8-sig").fillna("")
+            for ch, en in zip(df["chinese"], df["english"]):
+                key = fold(ch)
+                if key and en:
+                    variants = self.entries.get(key, {}).get("variants", [])
+                    self.entries[key] = {"english": en, "variants": variants}
+
+        self.matcher = GlossaryMatcher(self.entries)
+        print(f"✅ Idiom lexicon loaded: {len(self.entries)} idioms")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, text: str):
+        """Exact match first, then the longest idiom inside text. Returns (idiom, entry) or (None, None)."""
+        key = fold(text)
+        if key in self.entries:
+            return key, self.entries[key]
+        hit = self.matcher.longest_in(key)
+        if hit and len(hit) >= MIN_SUBSTRING_LEN:
+            return hit, self.entries[hit]
+        return None, None
+
+
+#built once per process, on first use
+_lexicon = None
+_lexicon_lock = threading.Lock()
+
+def get_idiom_lexicon() -> IdiomLexicon:
+    global _lexicon
+    with _lexicon_lock:
+        if _lexicon is None:
+            _lexicon = IdiomLexicon()
+        return _lexicon
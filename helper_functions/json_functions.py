@@ -31,6 +31,25 @@ def write_json(p, obj):
     Path(p).parent.mkdir(parents=True, exist_ok=True)
     Path(p).write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
 
+#write json atomically - readers see the old file or the new one, never a partial write
+def write_json_atomic(p, obj):
+    p = Path(p)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(f"{p.name}.{os.getpid()}.{time.time_ns()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, p)
+
+#read json written by write_json_atomic - no polling needed, missing/invalid returns default
+def read_json(p, default=None):
+    try:
+        with open(p, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
 #time lag to wait for json files to be created before proceeding to the next step
 def wait_for_file(path, timeout=10):
     start = time.time()
@@ -6,33 +6,109 @@ from helper_functions.json_functions import read_json_safely, write_json
 import unicodedata
 from pathlib import Path 
 import csv
-from helper_functions.dropbox import read_csv_from_dropbox, write_csv_to_dropbox
+from helper_functions.glossary_store import get_glossary_store
+from helper_functions.glossary_matcher import get_matcher
+from helper_functions.chinese_script import normalize, fold, fold_chars
+from helper_functions.compact_glossary import get_compact_glossary
+from helper_functions.idiom_lexicon import get_idiom_lexicon
+from helper_functions.ngram_index import get_ngram_index
 
-#remove white space in text
-def normalize(text: str) -> str:
-    """Unicode + whitespace normalization."""
-    return unicodedata.normalize("NFC", str(text)).strip().replace("\u3000", " ")
+# near-match score at or above which a glossary neighbour is used directly
+NEAR_MATCH_THRESHOLD = float(os.environ.get("NEAR_MATCH_THRESHOLD", 0.9))
+
+# weaker neighbours above this score are passed to web search as hints
+HINT_MIN_SCORE = 0.3
+
+# verification order by entity type (lower first); unknown types go last
+TYPE_PRIORITY = {"PERSON": 0, "ORGANISATION": 1, "LOCATION": 2, "EVENT": 3, "IDIOM": 4}
+
+# status of terms left out of web verification by the batch limit
+SKIPPED = "SKIPPED"
+
+# source of entities resolved through a near (n-gram) glossary neighbour
+NEAR_MATCH_SOURCE = "glossary (near match)"
+
+# sources whose terms are used for one translation but never written to the editable glossary
+NOT_SAVED_SOURCES = {"PETCI", NEAR_MATCH_SOURCE}
+
+#load glossary as {folded chinese: english} plus its matcher
+def load_glossary_index(glossary_path="/Resources/glossary.csv"):
+    """
+    Returns (glossary_dict, matcher) for the current glossary version.
+    glossary_dict is the process-wide CompactGlossary shared by every session;
+    both are rebuilt only when the glossary version changes, and both are
+    memory-mapped when GLOSSARY_MMAP_DIR is set.
+    Keys are folded (see chinese_script.fold), so traditional input and
+    punctuation variants find the simplified entry.
+    """
+
+    store = get_glossary_store()
+    version = (glossary_path, store.version())
+
+    # convert csv to a compact dict - only parsed again when the version changes
+    def pairs():
+        glossary = store.read_all().fillna("")
+        return ((fold(ch), en) for ch, en in zip(glossary["chinese"], glossary["english"]))
+
+    glossary_dict = get_compact_glossary(version, pairs)
+
+    # prebuilt multi-pattern matcher (flat arrays, see glossary_matcher)
+    matcher = get_matcher(glossary_dict, version=version)
+    return glossary_dict, matcher
+
+#scan the raw article against the glossary before extraction (Step 0.5)
+def prescan_glossary(input_text, glossary_path="/Resources/glossary.csv", min_len=2):
+    """
+    Find glossary terms directly in the article with one pass of the matcher.
+    Returns KNOWN entities (with their character spans) that do not need
+    to be extracted or looked up again.
+    """
+    glossary_dict, matcher = load_glossary_index(glossary_path)
+    text = unicodedata.normalize("NFC", str(input_text))
+
+    known = {}
+    # folding keeps the length, so spans point into the original text
+    for start, end, key in matcher.scan(fold_chars(text)):
+        eng = glossary_dict.get(key)
+        if len(key) < min_len or not eng:
+            continue
+        if key in known:
+            known[key]["spans"].append([start, end])
+            continue
+        known[key] = {
+            "entity_id": -(len(known) + 1),  # negative ids: not from the extraction agent
+            "chinese": text[start:end],
+            "type": "GLOSSARY",
+            "context_phrase": "",
+            "spans": [[start, end]],
+            "glossary_status": "KNOWN",
+            "translated_term": eng,
+            "source": "glossary"
+        }
+
+    print(f"✅ Glossary pre-scan: {len(known)} known terms found in the article")
+    return list(known.values())
 
 #mapping extracted entities to glossary (Step 1.5)
 def map_glossary_local(
     entities,
     glossary_path="/Resources/glossary.csv",
-    substring=True
+    substring=True,
+    use_idioms=True
 ):
     """
     Map extracted entities against glossary
     Creates two lists - mapped and unmapped
     Code to ensure deterministic mapping
+    With use_idioms, the read-only PETCI idiom lexicon is consulted after
+    the editable glossary (source="PETCI").
     """
 
-    # Step 2: read glossary
-    glossary = read_csv_from_dropbox(glossary_path).fillna("")
-
-    # convert csv to dict
-    glossary_dict = {
-        normalize(ch): en
-        for ch, en in zip(glossary["chinese"], glossary["english"])
-    }
+    # Step 2: read glossary and its prebuilt multi-pattern matcher
+    glossary_dict, matcher = load_glossary_index(glossary_path)
+    if not substring:
+        matcher = None
+    idioms = get_idiom_lexicon() if use_idioms else None
 
     # create two empty lists
     mapped_entities = [] #terms found in glossary
@@ -42,19 +118,30 @@ def map_glossary_local(
     for e in entities:
         # ensure each item is a normal python dict
         e_dict = e.dict() if hasattr(e, "dict") else e
-        # normalise the Chinese text
-        zh = normalize(e_dict.get("chinese", ""))
+        # normalise and fold the Chinese text (same folding as the index keys)
+        zh = fold(e_dict.get("chinese", ""))
         # try exact match first
         eng = glossary_dict.get(zh, None)
-        # if exact match fails, try substring search
-        if not eng and substring:
-            hits = [v for k, v in glossary_dict.items() if k and k in zh]
-            eng = max(hits, key=len) if hits else None
+        source = "glossary"
+        # read-only idiom tier: an exact idiom beats a partial glossary match
+        if not eng and idioms is not None:
+            entry = idioms.entries.get(zh)
+            if entry:
+                eng, source = entry["english"], "PETCI"
+        # if exact match fails, take the longest glossary key found inside the entity
+        if not eng and matcher is not None:
+            key = matcher.longest_in(zh)
+            eng = glossary_dict.get(key) if key else None
+        # finally, the longest idiom found inside the entity
+        if not eng and idioms is not None and substring:
+            _, entry = idioms.lookup(zh)
+            if entry:
+                eng, source = entry["english"], "PETCI"
         #update entity info 
         e_dict.update({
             "glossary_status": "KNOWN" if eng else "UNKNOWN",
             "translated_term": eng,
-            "source": "glossary" if eng else None
+            "source": source if eng else None
         })
         #append to correct list
         if eng:
@@ -65,24 +152,118 @@ def map_glossary_local(
     print(f"✅ Glossary mapping done: {len(mapped_entities)} mapped, {len(unmapped_entities)} unmapped")
     return mapped_entities, unmapped_entities
 
+#near-match suggestions for entities the exact/substring lookup missed (Step 1.6)
+def near_match_glossary(
+    unmapped_entities,
+    glossary_path="/Resources/glossary.csv",
+    threshold=NEAR_MATCH_THRESHOLD,
+    top_k=3
+):
+    """
+    Score all unmapped entities at once against the glossary keys with the
+    character n-gram TF-IDF index. Entities whose best neighbour reaches
+    threshold are resolved locally; the others keep their top neighbours
+    as "candidates" (hints for web_browse).
+    Returns (resolved, still_unmapped).
+    """
+    if not unmapped_entities:
+        return [], []
+
+    glossary_dict, _ = load_glossary_index(glossary_path)
+    index = get_ngram_index(glossary_dict)
+
+    items = [e.dict() if hasattr(e, "dict") else e for e in unmapped_entities]
+    neighbours = index.query([fold(e.get("chinese", "")) for e in items], top_k=top_k, min_score=HINT_MIN_SCORE)
+
+    resolved, still_unmapped = [], []
+    for e, hits in zip(items, neighbours):
+        if hits and hits[0][2] >= threshold:
+            key, eng, score = hits[0]
+            e.update({
+                "glossary_status": "KNOWN",
+                "translated_term": eng,
+                "source": NEAR_MATCH_SOURCE,
+                "near_match": {"chinese": key, "score": round(score, 3)}
+            })
+            resolved.append(e)
+        else:
+            e["candidates"] = [
+                {"chinese": key, "english": eng, "score": round(score, 3)} for key, eng, score in hits
+            ]
+            still_unmapped.append(e)
+
+    print(f"✅ Near-match lookup: {len(resolved)} resolved, {sum(bool(e['candidates']) for e in still_unmapped)} with hints")
+    return resolved, still_unmapped
+
+#deduplicate and rank unmapped entities before verification (Step 1.7)
+def prioritise_unmapped(unmapped_entities, input_text, batch=10):
+    """
+    Deduplicate unmapped entities by folded Chinese, count their mentions in
+    the article and rank them by type (PERSON/ORGANISATION before IDIOM),
+    then mention count, then first position. The first `batch` go to web
+    verification (batch=None keeps all).
+    Returns (selected, skipped); every entity carries "mentions" and "first_pos".
+    """
+    text = fold_chars(unicodedata.normalize("NFC", str(input_text)))
+
+    unique = {}
+    for e in unmapped_entities:
+        e_dict = e.dict() if hasattr(e, "dict") else e
+        key = fold(e_dict.get("chinese", ""))
+        if not key:
+            continue
+        if key in unique:
+            # not found verbatim in the article: count the extracted duplicates instead
+            if unique[key]["first_pos"] == len(text):
+                unique[key]["mentions"] += 1
+            continue
+        pos = text.find(key)
+        e_dict["first_pos"] = pos if pos != -1 else len(text)
+        e_dict["mentions"] = text.count(key) if pos != -1 else 1
+        unique[key] = e_dict
+
+    ranked = sorted(
+        unique.values(),
+        key=lambda e: (
+            TYPE_PRIORITY.get(str(e.get("type", "")).upper(), len(TYPE_PRIORITY)),
+            -e["mentions"],
+            e["first_pos"],
+        )
+    )
+    selected = ranked if batch is None else ranked[:batch]
+    skipped = [] if batch is None else ranked[batch:]
+
+    duplicates = len(unmapped_entities) - len(unique)
+    print(f"✅ Verification queue: {len(selected)} selected, {len(skipped)} skipped, {duplicates} duplicate(s) removed")
+    return selected, skipped
+
 #saving new terms to glossary (Step 3)
 def append_to_glossary_csv(final_terms, glossary_csv="/Resources/glossary.csv"):
     """
-    Append verified terms into Dropbox glossary.csv
+    Append verified terms into the glossary store
+    (Dropbox: written as a small delta file next to glossary.csv)
     """
 
-    # Load existing glossary
-    df = read_csv_from_dropbox(glossary_csv)
+    store = get_glossary_store()
 
-    # Track existing Chinese terms
-    existing = set(df["chinese"].tolist())
+    # existence is checked by folded key, the same key lookups use, so a
+    # traditional or punctuation variant of an entry is not written again
+    glossary_dict, _ = load_glossary_index(glossary_csv)
+    existing = {fold(zh) for zh in store.get([t.get("chinese", "") for t in final_terms])}
 
     rows_to_add = []
 
     for term in final_terms:
         zh = term.get("chinese", "").strip()
-        if not zh or zh in existing:
+        key = fold(zh)
+        # unverified (skipped) terms have no translation to keep; PETCI idioms
+        # live in their own read-only lexicon; near matches borrow a neighbour's
+        # translation for this run only and must not become KNOWN entries
+        if not zh or term.get("status") == SKIPPED or term.get("source") in NOT_SAVED_SOURCES:
             continue
+        if key in existing or key in glossary_dict:
+            continue
+        existing.add(key)
 
         rows_to_add.append({
             "chinese": zh,
@@ -94,10 +275,7 @@ def append_to_glossary_csv(final_terms, glossary_csv="/Resources/glossary.csv"):
 
     # Append new rows
     if rows_to_add:
-        df = pd.concat([df, pd.DataFrame(rows_to_add)], ignore_index=True)
-
-        # Save back to Dropbox
-        write_csv_to_dropbox(df, glossary_csv)
+        store.upsert(rows_to_add)
 
         print(f"✅ Glossary updated with {len(rows_to_add)} new entries → {glossary_csv}")
     else:
@@ -105,10 +283,11 @@ def append_to_glossary_csv(final_terms, glossary_csv="/Resources/glossary.csv"):
 
 
 # Step 3 - merging the terms into final_entities
-def merge_terms(mapped_entities, verified_entities):
+def merge_terms(mapped_entities, verified_entities, skipped_entities=()):
     """
     Combine glossary-mapped and web-verified terms.
     Verified terms override glossary results when available.
+    Entities left out of verification are listed with status SKIPPED.
     Returns final list of terms in memory.
     """
 
@@ -144,4 +323,18 @@ def merge_terms(mapped_entities, verified_entities):
             "links": v.get("source_links", [])[:3]
         }
 
+    # 3. Surface skipped items (no translation, not written to the glossary)
+    for e in skipped_entities:
+        zh = e.get("chinese")
+        if not zh or zh in merged:
+            continue
+
+        merged[zh] = {
+            "chinese": zh,
+            "english": "",
+            "status": SKIPPED,
+            "source": "not verified (batch limit)",
+            "links": []
+        }
+
     return list(merged.values())
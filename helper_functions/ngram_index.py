@@ -0,0 +1,120 @@
+# Import
+import math
+import threading
+import numpy as np
+
+# character n-gram sizes used for near-match scoring
+NGRAM_SIZES = (2, 3)
+
+#character bigram/trigram TF-IDF index over glossary keys
+class NgramIndex:
+    """
+    TF-IDF vectors of character bigrams and trigrams for every glossary key,
+    stored column-wise (one posting list per n-gram, as NumPy arrays).
+    Queries are scored together: one cosine-similarity row per query,
+    so a whole list of unmapped entities costs a few array operations.
+    """
+
+    def __init__(self, glossary_dict):
+        self.keys, self.values = [], []
+        postings = {}   # n-gram -> [(doc, count)]
+        for key, value in glossary_dict.items():
+            grams = _ngrams(key)
+            if not grams:
+                continue
+            doc = len(self.keys)
+            self.keys.append(key)
+            self.values.append(value)
+            for gram, count in grams.items():
+                postings.setdefault(gram, []).append((doc, count))
+
+        n_docs = len(self.keys)
+        self._vocab = {}
+        self._idf = np.zeros(len(postings))
+        ptr, docs, weights = [0], [], []
+        for col, (gram, plist) in enumerate(postings.items()):
+            self._vocab[gram] = col
+            # smoothed idf, as in scikit-learn
+            self._idf[col] = math.log((1 + n_docs) / (1 + len(plist))) + 1
+            for doc, count in plist:
+                docs.append(doc)
+                weights.append(count * self._idf[col])
+            ptr.append(len(docs))
+
+        self._ptr = np.array(ptr, dtype=np.int64)
+        self._docs = np.array(docs, dtype=np.int32)
+        self._weights = np.array(weights, dtype=np.float32)
+
+        # L2-normalise each document vector
+        norms = np.zeros(n_docs, dtype=np.float32)
+        np.add.at(norms, self._docs, self._weights ** 2)
+        self._weights /= np.sqrt(norms)[self._docs]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def query(self, texts, top_k=3, min_score=0.0):
+        """
+        Top-k neighbours for every text in one batch.
+        Returns one list per text of (key, value, score), best first.
+        """
+        if not texts or not self.keys:
+            return [[] for _ in texts]
+
+        # idf of an n-gram no glossary key contains (still counts towards the query norm)
+        unseen_idf = math.log(1 + len(self.keys)) + 1
+
+        rows, cols, vals = [], [], []
+        for q, text in enumerate(texts):
+            grams = {
+                g: c * (self._idf[self._vocab[g]] if g in self._vocab else unseen_idf)
+                for g, c in _ngrams(text).items()
+            }
+            norm = math.sqrt(sum(w * w for w in grams.values())) or 1.0
+            for gram, w in grams.items():
+                col = self._vocab.get(gram)
+                if col is None:
+                    continue
+                start, end = self._ptr[col], self._ptr[col + 1]
+                rows.append(np.full(end - start, q, dtype=np.int32))
+                cols.append(self._docs[start:end])
+                vals.append(self._weights[start:end] * (w / norm))
+
+        scores = np.zeros((len(texts), len(self.keys)), dtype=np.float32)
+        if rows:
+            np.add.at(scores, (np.concatenate(rows), np.concatenate(cols)), np.concatenate(vals))
+
+        k = min(top_k, len(self.keys))
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for q in range(len(texts)):
+            order = best[q][np.argsort(-scores[q, best[q]])]
+            results.append([
+                (self.keys[d], self.values[d], float(scores[q, d]))
+                for d in order if scores[q, d] > min_score
+            ])
+        return results
+
+
+def _ngrams(text: str) -> dict:
+    """{n-gram: count} for the configured n-gram sizes."""
+    counts = {}
+    for n in NGRAM_SIZES:
+        for i in range(len(text) - n + 1):
+            gram = text[i:i + n]
+            counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+#single-version cache: the shared CompactGlossary is replaced whenever the
+#glossary version changes, so the index is rebuilt when it sees a new object
+_index_lock = threading.Lock()
+_index_cache = {"glossary": None, "index": None}
+
+def get_ngram_index(glossary_dict) -> NgramIndex:
+    """Return the n-gram index for this glossary object, building it if needed."""
+    with _index_lock:
+        if _index_cache["glossary"] is not glossary_dict or _index_cache["index"] is None:
+            _index_cache["index"] = NgramIndex(glossary_dict)
+            _index_cache["glossary"] = glossary_dict
+        return _index_cache["index"]
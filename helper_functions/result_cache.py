@@ -0,0 +1,103 @@
+# Import
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from helper_functions.chinese_script import normalize
+
+# local cache file for finished translations
+CACHE_PATH = os.environ.get("RESULT_CACHE_PATH", "cache/result_cache.sqlite")
+
+# total size of cached results kept on disk (bytes); least recently used go first
+MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+
+#persistent cache of whole pipeline results
+class ResultCache:
+    """
+    SQLite cache of (result, final_terms) per request, keyed by the normalized
+    input text, the glossary version and the model/prompt version.
+    Size-bounded: after each insert the least recently used entries are
+    evicted until the total stays under max_bytes.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                   key TEXT PRIMARY KEY,
+                   result TEXT NOT NULL,
+                   final_terms TEXT NOT NULL,
+                   size INTEGER NOT NULL,
+                   created_at REAL NOT NULL,
+                   last_used REAL NOT NULL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(input_text: str, glossary_version: str, model_version: str) -> str:
+        payload = "\x1f".join([normalize(input_text), str(glossary_version), str(model_version)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Return (result, final_terms) and mark the entry as recently used, or None."""
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT result, final_terms FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if not found:
+                return None
+            self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(found[0]), json.loads(found[1])
+
+    def put(self, key: str, result, final_terms):
+        result_json = json.dumps(result, ensure_ascii=False, default=str)
+        terms_json = json.dumps(final_terms, ensure_ascii=False, default=str)
+        size = len(result_json.encode("utf-8")) + len(terms_json.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (key, result_json, terms_json, size, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits (caller holds the lock)."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes}
+
+
+#shared instance, created on first use
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_result_cache() -> ResultCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
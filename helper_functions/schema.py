@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 #for ensuring output is json format
 class Entity(BaseModel):
@@ -13,3 +13,24 @@ class Entity(BaseModel):
 
 class EntityList(BaseModel):
     entities: List[Entity]
+
+#structured output for batched web verification
+class VerifiedEntity(BaseModel):
+    entity_id: int
+    chinese: str
+    translated_term: str
+    source_links: List[str] = []
+    verification_status: Literal["VERIFIED", "MULTIPLE", "UNVERIFIED", "ERROR"]
+    notes: Optional[str] = ""
+
+class VerifiedEntityList(BaseModel):
+    entities: List[VerifiedEntity]
+
+#structured output for paragraph-aligned translation
+class ParagraphTranslation(BaseModel):
+    index: int
+    english: str
+
+class TranslationOutput(BaseModel):
+    paragraphs: List[ParagraphTranslation]
+    notes: Optional[str] = ""
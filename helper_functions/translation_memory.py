@@ -0,0 +1,174 @@
+# Import
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+import numpy as np
+from helper_functions.chinese_script import normalize, fold
+
+# local translation memory (aligned source -> target paragraphs)
+TM_PATH = os.environ.get("TRANSLATION_MEMORY_PATH", "cache/translation_memory.sqlite")
+
+# paragraphs kept; least recently used ones (and their LSH buckets) are evicted beyond this
+MAX_ENTRIES = int(os.environ.get("TM_MAX_ENTRIES", 50_000))
+
+# estimated MinHash similarity at or above which a stored paragraph is offered as a reference
+FUZZY_THRESHOLD = float(os.environ.get("TM_FUZZY_THRESHOLD", 0.7))
+
+# MinHash over character shingles, split into LSH bands for candidate lookup
+SHINGLE = 3
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_PRIME = np.uint64(4294967291)   # largest prime below 2**32, so a*h+b fits in uint64
+_rng = np.random.default_rng(0)
+_A = _rng.integers(1, 2**32 - 1, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2**32 - 1, NUM_PERM, dtype=np.uint64)
+
+
+def terms_signature(terms: list) -> str:
+    """Fingerprint of the glossary terms (chinese -> english) used for one paragraph."""
+    pairs = sorted(f"{t.get('chinese', '')}={t.get('english', t.get('translated_term', ''))}" for t in terms)
+    return hashlib.sha1("\x1f".join(pairs).encode("utf-8")).hexdigest()[:16]
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of the character shingles of the folded text."""
+    text = fold(text)
+    shingles = {text[i:i + SHINGLE] for i in range(max(len(text) - SHINGLE + 1, 1))}
+    hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles], dtype=np.uint64)
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def _bands(signature: np.ndarray):
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        yield band, hashlib.sha1(rows.tobytes()).hexdigest()[:16]
+
+
+#persistent paragraph translation memory
+class TranslationMemory:
+    """
+    SQLite store of aligned source -> target paragraphs from completed translations.
+    Exact lookups use a hash of the normalized paragraph plus the signature of
+    the glossary terms it contains (a glossary change invalidates the match).
+    Near-duplicates are found through MinHash LSH buckets and returned as
+    references for the model, never reused verbatim.
+    Size-bounded: beyond max_entries the least recently used paragraphs are
+    evicted together with their bucket rows.
+    """
+
+    def __init__(self, path=TM_PATH, fuzzy_threshold=FUZZY_THRESHOLD, max_entries=MAX_ENTRIES):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.fuzzy_threshold = fuzzy_threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS tm (
+                   key TEXT PRIMARY KEY,
+                   source TEXT NOT NULL,
+                   target TEXT NOT NULL,
+                   signature BLOB NOT NULL,
+                   created_at REAL NOT NULL,
+                   last_used REAL NOT NULL,
+                   uses INTEGER NOT NULL DEFAULT 0
+               )"""
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS tm_bands (band INTEGER, bucket TEXT, key TEXT)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tm_bands_lookup ON tm_bands (band, bucket)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tm_bands_key ON tm_bands (key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tm_last_used ON tm (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(source: str, terms_sig: str) -> str:
+        return hashlib.sha1(f"{normalize(source)}\x1f{terms_sig}".encode("utf-8")).hexdigest()
+
+    def exact(self, source: str, terms_sig: str):
+        """Stored target for this paragraph and glossary terms, or None."""
+        key = self.make_key(source, terms_sig)
+        with self._lock:
+            found = self._conn.execute("SELECT target FROM tm WHERE key = ?", (key,)).fetchone()
+            if found:
+                self._conn.execute("UPDATE tm SET last_used = ?, uses = uses + 1 WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+        return found[0] if found else None
+
+    def similar(self, source: str):
+        """Best near-duplicate as (source, target, similarity), or None."""
+        signature = minhash(source)
+        with self._lock:
+            keys = set()
+            for band, bucket in _bands(signature):
+                keys.update(k for (k,) in self._conn.execute(
+                    "SELECT key FROM tm_bands WHERE band = ? AND bucket = ?", (band, bucket)
+                ))
+            if not keys:
+                return None
+            rows = self._conn.execute(
+                f"SELECT key, source, target, signature FROM tm WHERE key IN ({', '.join('?' * len(keys))})",
+                list(keys),
+            ).fetchall()
+
+        best, best_key = None, None
+        for key, src, tgt, blob in rows:
+            score = float((np.frombuffer(blob, dtype=np.uint64) == signature).mean())
+            if score >= self.fuzzy_threshold and (best is None or score > best[2]):
+                best, best_key = (src, tgt, score), key
+        if best_key:
+            # a paragraph offered as a reference counts as used for eviction
+            with self._lock:
+                self._conn.execute("UPDATE tm SET last_used = ?, uses = uses + 1 WHERE key = ?", (time.time(), best_key))
+                self._conn.commit()
+        return best
+
+    def add(self, source: str, target: str, terms_sig: str):
+        key = self.make_key(source, terms_sig)
+        signature = minhash(source)
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM tm WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                """INSERT INTO tm (key, source, target, signature, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(key) DO UPDATE SET target = excluded.target, last_used = excluded.last_used""",
+                (key, source, target, signature.tobytes(), now, now),
+            )
+            if not exists:
+                self._conn.executemany(
+                    "INSERT INTO tm_bands VALUES (?, ?, ?)",
+                    [(band, bucket, key) for band, bucket in _bands(signature)],
+                )
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used paragraphs beyond max_entries (caller holds the lock)."""
+        excess = self._conn.execute("SELECT COUNT(*) FROM tm").fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return
+        keys = self._conn.execute("SELECT key FROM tm ORDER BY last_used LIMIT ?", (excess,)).fetchall()
+        self._conn.executemany("DELETE FROM tm_bands WHERE key = ?", keys)
+        self._conn.executemany("DELETE FROM tm WHERE key = ?", keys)
+
+    def stats(self):
+        with self._lock:
+            count, uses = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(uses), 0) FROM tm").fetchone()
+        return {"entries": count, "uses": uses, "max_entries": self.max_entries}
+
+
+#shared instance, created on first use
+_tm = None
+_tm_lock = threading.Lock()
+
+def get_translation_memory() -> TranslationMemory:
+    global _tm
+    with _tm_lock:
+        if _tm is None:
+            _tm = TranslationMemory()
+        return _tm
@@ -0,0 +1,89 @@
+# Import
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from helper_functions.chinese_script import normalize
+
+# local cache file for web_browse results
+CACHE_PATH = os.environ.get("VERIFICATION_CACHE_PATH", "cache/verification_cache.sqlite")
+
+# how long each outcome stays valid (seconds)
+TTL_BY_STATUS = {
+    "VERIFIED": 30 * 24 * 3600,    # long-lived
+    "MULTIPLE": 7 * 24 * 3600,
+    "UNVERIFIED": 24 * 3600,       # retry the next day
+    "ERROR": 10 * 60,              # short cooldown after a failure
+}
+
+#persistent cache of web verification rows
+class VerificationCache:
+    """
+    SQLite cache of web_browse rows keyed by normalized chinese + region
+    (+ optional context phrase). Successful lookups are kept for a long time,
+    failures only for a short cooldown so they are retried soon.
+    """
+
+    def __init__(self, path=CACHE_PATH, use_context=False):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.use_context = use_context
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS verification (
+                   key TEXT PRIMARY KEY,
+                   row TEXT NOT NULL,
+                   status TEXT NOT NULL,
+                   expires_at REAL NOT NULL
+               )"""
+        )
+        self._conn.commit()
+
+    def make_key(self, item: dict) -> str:
+        zh = normalize(item.get("chinese", ""))
+        reg = normalize(item.get("region", "SG") or "SG").upper()
+        ctx = normalize(item.get("context_phrase", "")) if self.use_context else ""
+        return f"{zh}\x1f{reg}\x1f{ctx}"
+
+    def get(self, item: dict):
+        """Return the cached row for this entity, or None if missing/expired."""
+        key = self.make_key(item)
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT row, expires_at FROM verification WHERE key = ?", (key,)
+            )
+            found = cur.fetchone()
+        if not found or found[1] < time.time():
+            return None
+        return json.loads(found[0])
+
+    def put(self, item: dict, row: dict):
+        """Store a web_browse row with a TTL based on its verification status."""
+        status = row.get("verification_status", "UNVERIFIED")
+        ttl = TTL_BY_STATUS.get(status, TTL_BY_STATUS["UNVERIFIED"])
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verification (key, row, status, expires_at) VALUES (?, ?, ?, ?)",
+                (self.make_key(item), json.dumps(row, ensure_ascii=False), status, time.time() + ttl),
+            )
+            self._conn.commit()
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM verification WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+
+
+#shared instance, created on first use
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_verification_cache() -> VerificationCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = VerificationCache()
+        return _cache
@@ -3,7 +3,13 @@ from openai import OpenAI
 from docx import Document
 import tempfile
 import os
+import re
 import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import ValidationError
+from helper_functions.schema import TranslationOutput
+from helper_functions.translation_memory import get_translation_memory, terms_signature
 
 # Load API key from HuggingFace environment variables
 OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
@@ -46,6 +52,33 @@ word_tool = [
     }
 ]
 
+#style guidelines shared by every translation prompt
+style_guidelines = """\
+Idioms: use standard English equivalent if available. Otherwise paraphrase naturally; optionally add a brief literal gloss in brackets only if it aids clarity. 
+Introduce acronyms on first mention; avoid multiple variants in brackets; pick one best form.
+
+Other translation guidelines:
+    - WORD CHOICE
+        •	Prefer slightly elevated but natural word choices where they improve readability (e.g., grand drum vs big drum).
+        •	Use mainstream English for religious/philosophical terms (e.g., Zen Buddhism, Ancestor).
+        •	For cultural festivals, use mainstream SG media forms (Lunar New Year, Hungry Ghost Festival).
+    - NAMES
+        •	For Singapore personalities (politicians, community leaders, volunteers, artists), ALWAYS use the official English spelling of names, followed by community-used names if official English spelling is not available.
+        •	If no official spelling exists, use pinyin and mark (to verify).
+        •	Always use official English names for Singapore institutions, clan associations, and venues (e.g., SFCCA, SCCCI, School of the Arts (SOTA) Concert Hall).
+    - GENERAL STYLE
+        •	Avoid academic digressions or multiple variants in brackets — select the best single form.
+        •	Ensure translations read smoothly and naturally for a Singaporean English-speaking audience.
+        •	Use Natural, Fluent English.  Ensure the translation reads smoothly and naturally.
+        •	Preserve the meaning, tone, and nuance of the original.
+    
+Ensure:
+- Consistency of entity names throughout the translation.
+- Correct acronym introduction (first mention spelled out).
+- No added or altered facts.
+- Original paragraphing preserved.
+"""
+
 #translation prompt
 
 translation_prompt = """
@@ -89,30 +122,7 @@ IMPORTANT — DO NOT SKIP THE HEADLINE:
 
 Preserve paragraphing.  Avoid added or altered facts.
 
-Idioms: use standard English equivalent if available. Otherwise paraphrase naturally; optionally add a brief literal gloss in brackets only if it aids clarity. 
-Introduce acronyms on first mention; avoid multiple variants in brackets; pick one best form.
-
-Other translation guidelines:
-    - WORD CHOICE
-        •	Prefer slightly elevated but natural word choices where they improve readability (e.g., grand drum vs big drum).
-        •	Use mainstream English for religious/philosophical terms (e.g., Zen Buddhism, Ancestor).
-        •	For cultural festivals, use mainstream SG media forms (Lunar New Year, Hungry Ghost Festival).
-    - NAMES
-        •	For Singapore personalities (politicians, community leaders, volunteers, artists), ALWAYS use the official English spelling of names, followed by community-used names if official English spelling is not available.
-        •	If no official spelling exists, use pinyin and mark (to verify).
-        •	Always use official English names for Singapore institutions, clan associations, and venues (e.g., SFCCA, SCCCI, School of the Arts (SOTA) Concert Hall).
-    - GENERAL STYLE
-        •	Avoid academic digressions or multiple variants in brackets — select the best single form.
-        •	Ensure translations read smoothly and naturally for a Singaporean English-speaking audience.
-        •	Use Natural, Fluent English.  Ensure the translation reads smoothly and naturally.
-        •	Preserve the meaning, tone, and nuance of the original.
-    
-Ensure:
-- Consistency of entity names throughout the translation.
-- Correct acronym introduction (first mention spelled out).
-- No added or altered facts.
-- Original paragraphing preserved.
-
+""" + style_guidelines + """
 -----------------------------------------------------------------------
 OUTPUT FORMAT
 -----------------------------------------------------------------------
@@ -126,6 +136,63 @@ OUTPUT FORMAT
      Brief clarifications about tricky names or idioms.
 """
 
+#prompt for paragraph-aligned English-only output (structured and chunked modes)
+#the Mandarin original is rebuilt locally, so the model does not echo it back
+paragraph_prompt = """
+You are an expert bilingual Chinese→English news translator with rigorous terminology discipline. 
+You translate faithfully, apply verified glossary terms consistently, and write in clear, concise, journalistic UK English for a Singapore audience.
+**Do NOT use content, quotes, or wording sourced from Lianhe Zaobao (早报) to verify your English translation.**  
+
+You are translating PART {part} of {total} of a news article.
+{headline_rule}
+
+-----------------------------------------------------------------------
+VERIFIED TERMS PROVIDED
+-----------------------------------------------------------------------
+Always use these exact English names or expressions whenever they appear 
+in the source text — do not override, retranslate, or ignore them.
+
+{verified_table}
+
+If a Chinese name or term is not in the list, use pinyin for names and clear English paraphrasing for expressions.
+{references}
+-----------------------------------------------------------------------
+TRANSLATION GUIDELINES
+-----------------------------------------------------------------------
+Each source paragraph below is prefixed with its index in square brackets.
+Translate EVERY paragraph, one English paragraph per index. Never merge or skip paragraphs.
+
+<source_text>
+{text}
+</source_text>
+
+""" + style_guidelines + """
+-----------------------------------------------------------------------
+OUTPUT FORMAT
+-----------------------------------------------------------------------
+{output_format}
+Do NOT copy the Chinese text.
+"""
+
+# output formats for paragraph_prompt
+json_output_format = """Return ONLY JSON:
+{"paragraphs": [{"index": <int>, "english": "<translation>"}], "notes": "<brief clarifications about tricky names or idioms, or empty>"}"""
+
+stream_output_format = """Output ONLY the English paragraphs, in order, separated by blank lines. Do NOT include the [index] prefixes.
+If there are tricky names or idioms, end with a final line starting with "NOTES:" followed by brief clarifications."""
+
+# schema sent with paragraph-aligned requests (structured output)
+PARAGRAPH_SCHEMA = {
+    "type": "json_schema",
+    "name": "paragraph_translation",
+    "schema": TranslationOutput.model_json_schema(),
+}
+
+# changes whenever a prompt or output format changes (part of the result cache key)
+PROMPT_VERSION = hashlib.sha1(
+    "\x1f".join([translation_prompt, paragraph_prompt, json_output_format, stream_output_format]).encode("utf-8")
+).hexdigest()[:12]
+
 #format block to insert into prompt
 def make_verified_terms_block(final_terms) -> str:
     lines = []
@@ -142,12 +209,493 @@ def make_verified_terms_block(final_terms) -> str:
 
     return "\n".join(lines) if lines else "No verified terms available."
 
-def translate_function (input_text: str, final_terms: list) -> str:
+
+# maximum characters of Chinese source per chunk in chunked mode
+CHUNK_CHARS = 1200
+
+# placeholder for a paragraph that did not come back from the model
+MISSING_MARKER = "[translation missing]"
+
+# output budget for one paragraph-aligned JSON request, and the ceiling a single
+# long paragraph may be retried with
+JSON_OUTPUT_TOKENS = 4096
+MAX_JSON_OUTPUT_TOKENS = 16384
+
+def split_paragraphs(text: str) -> list:
+    """Split the source text into non-empty paragraphs (one per line)."""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+def chunk_paragraphs(paragraphs: list, max_chars: int = CHUNK_CHARS) -> list:
+    """
+    Group consecutive paragraph indexes into chunks of about max_chars.
+    The headline (paragraph 0) always travels with the first chunk.
+    """
+    chunks, current, size = [], [], 0
+    for i, para in enumerate(paragraphs):
+        # keep the headline together with the first body paragraph
+        if current and size + len(para) > max_chars and current != [0]:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(i)
+        size += len(para)
+    if current:
+        chunks.append(current)
+    return chunks
+
+def terms_in_text(final_terms: list, text: str) -> list:
+    """Keep only the glossary terms whose Chinese form occurs in text."""
+    return [t for t in final_terms if t.get("chinese") and t["chinese"] in text]
+
+def make_references_block(references: dict) -> str:
+    """Earlier translations of near-duplicate paragraphs (translation memory) for the prompt."""
+    if not references:
+        return ""
+    lines = "\n".join(f"[{i}] {target}" for i, target in sorted(references.items()))
+    return (
+        "\nEARLIER TRANSLATIONS OF SIMILAR PARAGRAPHS (same index as the source paragraph)\n"
+        "Reuse their wording where the source is unchanged; translate any changed parts afresh.\n"
+        + lines + "\n"
+    )
+
+#paragraph-level translation memory
+def new_tm_report() -> dict:
+    return {"paragraphs": 0, "exact": 0, "fuzzy": 0, "tokens_saved": 0}
+
+def tm_lookup(paragraphs: list, indexes: list, final_terms: list, report: dict | None = None):
+    """
+    Returns ({index: reused english} for exact matches, {index: reference english}
+    for near-duplicates). Exact matches also require the same glossary terms.
+    """
+    tm = get_translation_memory()
+    reused, references = {}, {}
+    for i in indexes:
+        source = paragraphs[i]
+        # paragraphs with speculative placeholders are never shared
+        if _PLACEHOLDER_RE.search(source):
+            continue
+        target = tm.exact(source, terms_signature(terms_in_text(final_terms, source)))
+        if target:
+            reused[i] = target
+            continue
+        near = tm.similar(source)
+        if near:
+            references[i] = near[1]
+
+    if report is not None:
+        report["paragraphs"] += len(indexes)
+        report["exact"] += len(reused)
+        report["fuzzy"] += len(references)
+        # rough estimate: ~1 token per Chinese character in, ~1 token per 4 characters out
+        report["tokens_saved"] += sum(len(paragraphs[i]) + len(t) // 4 for i, t in reused.items())
+    return reused, references
+
+def tm_store(paragraphs: list, english: dict, final_terms: list):
+    """Add freshly translated paragraphs to the translation memory."""
+    tm = get_translation_memory()
+    for i, target in english.items():
+        source = paragraphs[i]
+        if not target or target.startswith(MISSING_MARKER) or _PLACEHOLDER_RE.search(source + target):
+            continue
+        tm.add(source, target, terms_signature(terms_in_text(final_terms, source)))
+
+def format_tm_report(report: dict) -> str:
+    total = report["paragraphs"] or 1
+    return (
+        f"📚 Translation memory: {report['exact']}/{report['paragraphs']} paragraphs reused "
+        f"({100 * report['exact'] / total:.0f}% hit rate), {report['fuzzy']} near matches as references, "
+        f"~{report['tokens_saved']:,} tokens saved"
+    )
+
+def is_truncated(response) -> bool:
+    """True if the response was cut off at max_output_tokens."""
+    details = getattr(response, "incomplete_details", None)
+    return getattr(response, "status", None) == "incomplete" and getattr(details, "reason", None) == "max_output_tokens"
+
+def assemble_output(input_text: str, english: str, notes: str = "") -> str:
+    """Rebuild the usual three-section layout from the source and the English text."""
+    sections = [
+        "1) Mandarin Original",
+        input_text.strip(),
+        "",
+        "2) English Translation",
+        english.strip(),
+    ]
+    if notes.strip():
+        sections += ["", "3) Notes (optional)", notes.strip()]
+    return "\n".join(sections)
+
+def _request_paragraphs(paragraphs: list, indexes: list, part: int, total: int, final_terms: list, references: dict | None = None, max_output_tokens: int = JSON_OUTPUT_TOKENS):
+    """
+    One paragraph-aligned request. Returns ({index: english}, notes).
+    A JSON answer cut off at max_output_tokens cannot be continued (each
+    continuation would be a new complete object), so the batch is split in
+    half and each half requested on its own; a single paragraph that still
+    does not fit is retried with a larger budget.
+    """
+    text = "\n\n".join(f"[{i}] {paragraphs[i]}" for i in indexes)
+    headline_rule = (
+        "Paragraph [0] is the HEADLINE. You MUST translate it. NEVER omit, merge, or reinterpret it."
+        if 0 in indexes else ""
+    )
+    prompt = paragraph_prompt.format(
+        part=part,
+        total=total,
+        headline_rule=headline_rule,
+        verified_table=make_verified_terms_block(terms_in_text(final_terms, text)),
+        references=make_references_block({i: r for i, r in (references or {}).items() if i in indexes}),
+        text=text,
+        output_format=json_output_format
+    )
+    response = client.responses.create(
+        model="gpt-4o-mini",
+        input=prompt,
+        temperature=0.1,
+        max_output_tokens=max_output_tokens,
+        text={"format": PARAGRAPH_SCHEMA}
+    )
+
+    if is_truncated(response):
+        if len(indexes) > 1:
+            half = len(indexes) // 2
+            print(f"↪️ Output truncated, splitting paragraphs {indexes[0]}–{indexes[-1]} into two requests…")
+            first, first_notes = _request_paragraphs(paragraphs, indexes[:half], part, total, final_terms, references, max_output_tokens)
+            second, second_notes = _request_paragraphs(paragraphs, indexes[half:], part, total, final_terms, references, max_output_tokens)
+            return {**first, **second}, "\n".join(n for n in (first_notes, second_notes) if n)
+        if max_output_tokens < MAX_JSON_OUTPUT_TOKENS:
+            print(f"↪️ Output truncated, retrying paragraph {indexes[0]} with a larger budget…")
+            return _request_paragraphs(paragraphs, indexes, part, total, final_terms, references,
+                                       min(max_output_tokens * 2, MAX_JSON_OUTPUT_TOKENS))
+
+    output = response.output_text or ""
+    s, t = output.find("{"), output.rfind("}")
+    try:
+        parsed = TranslationOutput.model_validate_json(output[s:t+1] if s != -1 and t != -1 else "{}")
+    except ValidationError:
+        return {}, ""
+
+    wanted = set(indexes)
+    english = {p.index: p.english.strip() for p in parsed.paragraphs if p.index in wanted and p.english.strip()}
+    return english, parsed.notes or ""
+
+def translate_paragraphs(paragraphs: list, indexes: list, final_terms: list, part: int = 1, total: int = 1, retries: int = 1, use_tm: bool = True, tm_report: dict | None = None):
+    """
+    Translate the given paragraph indexes and check that every one came back.
+    Missing or empty paragraphs (the headline included) are requested again;
+    anything still missing is flagged in the output instead of silently dropped.
+    With use_tm, exact translation-memory matches are reused verbatim and only
+    the other paragraphs are sent to the model (near matches as references);
+    new translations are stored back. Counts are added to tm_report.
+    Returns ({index: english}, notes).
+    """
+    reused, references = tm_lookup(paragraphs, indexes, final_terms, tm_report) if use_tm else ({}, {})
+    todo = [i for i in indexes if i not in reused]
+    if not todo:
+        return reused, ""
+
+    english, notes = _request_paragraphs(paragraphs, todo, part, total, final_terms, references)
+
+    for _ in range(retries):
+        missing = [i for i in todo if i not in english]
+        if not missing:
+            break
+        print(f"⚠️ Paragraphs {missing} missing from the translation, requesting again…")
+        extra, extra_notes = _request_paragraphs(paragraphs, missing, part, total, final_terms, references)
+        english.update(extra)
+        notes = "\n".join(n for n in (notes, extra_notes) if n)
+
+    if use_tm:
+        tm_store(paragraphs, english, final_terms)
+
+    for i in todo:
+        if i not in english:
+            english[i] = f"{MISSING_MARKER} {paragraphs[i]}"
+
+    return {**reused, **english}, notes
+
+def translate_structured(input_text: str, final_terms: list) -> str:
+    """
+    Translate the whole article as paragraph-aligned English only,
+    then rebuild the Mandarin section locally from input_text.
+    """
+    paragraphs = split_paragraphs(input_text)
+    report = new_tm_report()
+    english, notes = translate_paragraphs(paragraphs, list(range(len(paragraphs))), final_terms, tm_report=report)
+    print(format_tm_report(report))
+    body = "\n\n".join(english[i] for i in range(len(paragraphs)))
+    return assemble_output(input_text, body, notes)
+
+def translate_chunked(input_text: str, final_terms: list, max_chars: int = CHUNK_CHARS, max_workers: int = 4) -> str:
+    """
+    Translate a long article chunk by chunk (split on paragraph boundaries),
+    with chunks running in parallel, then reassemble the usual layout.
+    """
+    paragraphs = split_paragraphs(input_text)
+    chunks = chunk_paragraphs(paragraphs, max_chars)
+    total = len(chunks)
+    print(f"✂️ Translating {len(paragraphs)} paragraphs in {total} chunk(s)…")
+
+    # one report per chunk (chunks run in parallel), summed afterwards
+    reports = [new_tm_report() for _ in chunks]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total))) as pool:
+        futures = [
+            pool.submit(translate_paragraphs, paragraphs, chunk, final_terms, n + 1, total, tm_report=reports[n])
+            for n, chunk in enumerate(chunks)
+        ]
+        parts = [f.result() for f in futures]
+    print(format_tm_report({k: sum(r[k] for r in reports) for k in reports[0]}))
+
+    english = {}
+    for part_english, _ in parts:
+        english.update(part_english)
+    body = "\n\n".join(english[i] for i in range(len(paragraphs)))
+    notes = "\n".join(p[1] for p in parts if p[1])
+    return assemble_output(input_text, body, notes)
+
+# placeholder for a term still being verified while the draft is translated
+PLACEHOLDER = "[[T{n}]]"
+_PLACEHOLDER_RE = re.compile(r"\[\[T\d+\]\]")
+_HAN_RE = re.compile(r"[\u3400-\u9fff]")
+
+def mask_terms(paragraphs: list, terms: list):
+    """
+    Replace every occurrence of the given Chinese terms (longest first) with
+    a placeholder. Returns (masked paragraphs, {placeholder: chinese}).
+    """
+    placeholders = {}
+    masked = list(paragraphs)
+    for n, zh in enumerate(sorted({t for t in terms if t}, key=len, reverse=True), start=1):
+        tag = PLACEHOLDER.format(n=n)
+        hit = False
+        for i, para in enumerate(masked):
+            if zh in para:
+                masked[i] = para.replace(zh, tag)
+                hit = True
+        if hit:
+            placeholders[tag] = zh
+    return masked, placeholders
+
+def translate_draft(input_text: str, known_terms: list, pending_terms: list) -> dict:
+    """
+    Speculative first pass: translate with the KNOWN terms while the terms in
+    pending_terms (Chinese strings) are still being verified. Those terms are
+    masked with placeholders that the model must copy verbatim.
+    Returns the draft state for patch_draft.
+    """
+    paragraphs = split_paragraphs(input_text)
+    masked, placeholders = mask_terms(paragraphs, pending_terms)
+    # placeholders travel as pseudo-terms, so they are listed in the verified table
+    keep = [
+        {"chinese": tag, "english": tag, "status": "placeholder - copy exactly, filled in later"}
+        for tag in placeholders
+    ]
+    english, notes = translate_paragraphs(masked, list(range(len(masked))), known_terms + keep)
+    return {
+        "input_text": input_text,
+        "paragraphs": paragraphs,
+        "masked": masked,
+        "placeholders": placeholders,
+        "english": english,
+        "notes": notes,
+    }
+
+def patch_draft(draft: dict, final_terms: list) -> str:
+    """
+    Fill the verified English forms into the draft. A paragraph is patched by
+    plain substitution when each of its placeholders came back intact and has
+    a usable English form; otherwise only that paragraph is translated again
+    (with the full final_terms). Returns the assembled output.
+    """
+    english_for = {}
+    for t in final_terms:
+        en = (t.get("translated_term") or t.get("english") or "").strip()
+        if t.get("chinese") and en and not _HAN_RE.search(en):
+            english_for[t["chinese"]] = en
+
+    english = dict(draft["english"])
+    redo = []
+    for i, masked in enumerate(draft["masked"]):
+        tags = set(_PLACEHOLDER_RE.findall(masked))
+        text = english[i]
+        if any(text.count(tag) != masked.count(tag) for tag in tags) or \
+                any(draft["placeholders"][tag] not in english_for for tag in tags):
+            redo.append(i)
+            continue
+        for tag in tags:
+            text = text.replace(tag, english_for[draft["placeholders"][tag]])
+        if _PLACEHOLDER_RE.search(text):
+            redo.append(i)
+            continue
+        english[i] = text
+
+    # notes may mention a placeholder too
+    notes = _PLACEHOLDER_RE.sub(
+        lambda m: english_for.get(draft["placeholders"].get(m.group(0), ""), draft["placeholders"].get(m.group(0), m.group(0))),
+        draft["notes"]
+    )
+    if redo:
+        print(f"✏️ Re-translating {len(redo)} paragraph(s) the placeholders could not patch…")
+        fixed, extra_notes = translate_paragraphs(draft["paragraphs"], redo, final_terms)
+        english.update(fixed)
+        notes = "\n".join(n for n in (notes, extra_notes) if n)
+    else:
+        print("✅ Draft patched by placeholder substitution only.")
+
+    body = "\n\n".join(english[i] for i in range(len(draft["paragraphs"])))
+    return assemble_output(draft["input_text"], body, notes)
+
+# heading the model puts before its translator's notes
+NOTES_MARKER = "NOTES:"
+
+class TranslationStream:
+    """
+    Iterable of English text deltas for st.write_stream.
+    Once fully consumed, `result` holds the assembled three-section output
+    and on_complete (if set) is called. Paragraphs missing from the stream
+    (cut off, or the count does not line up) are requested again with
+    translate_paragraphs; `complete` is False if any is still missing.
+    """
+
+    def __init__(self, input_text: str, final_terms: list, use_tm: bool = True):
+        self.input_text = input_text
+        self.final_terms = final_terms
+        self.use_tm = use_tm
+        self.result = None
+        self.english = None   # {paragraph index: english}
+        self.missing = []     # paragraph indexes still marked [translation missing]
+        self.complete = False # every paragraph translated (safe to cache)
+        self.on_complete = None
+        self.tm_report = new_tm_report()
+
+    def __iter__(self):
+        paragraphs = split_paragraphs(self.input_text)
+        indexes = list(range(len(paragraphs)))
+        reused, references = tm_lookup(paragraphs, indexes, self.final_terms, self.tm_report) if self.use_tm else ({}, {})
+        todo = [i for i in indexes if i not in reused]
+        print(format_tm_report(self.tm_report))
+
+        shown = []   # everything yielded, in display order
+
+        def emit(piece):
+            shown.append(piece)
+            return piece
+
+        # reused paragraphs up to the next one that has to be translated
+        def reused_run(pos):
+            while pos < len(indexes) and indexes[pos] in reused:
+                yield emit(reused[indexes[pos]] + "\n\n")
+                pos += 1
+
+        yield from reused_run(0)
+
+        chunks, truncated = [], False
+        if todo:
+            text = "\n\n".join(f"[{i}] {paragraphs[i]}" for i in todo)
+            prompt = paragraph_prompt.format(
+                part=1,
+                total=1,
+                headline_rule="Paragraph [0] is the HEADLINE. You MUST translate it as the first line. NEVER omit it." if 0 in todo else "",
+                verified_table=make_verified_terms_block(terms_in_text(self.final_terms, text)),
+                references=make_references_block(references),
+                text=text,
+                output_format=stream_output_format
+            )
+
+            stream = client.responses.create(
+                model="gpt-4o-mini",
+                input=prompt,
+                temperature=0.1,
+                max_output_tokens=4096,
+                stream=True
+            )
+
+            # a blank line ends a translated paragraph; reused ones that follow it are slotted in there
+            done, pending, in_notes = 0, "", False
+            for event in stream:
+                if getattr(event, "type", "") == "response.incomplete":
+                    truncated = is_truncated(event.response)
+                    continue
+                if getattr(event, "type", "") != "response.output_text.delta":
+                    continue
+                chunks.append(event.delta)
+                if in_notes:
+                    continue
+                pending += event.delta
+                while done < len(todo) - 1 and "\n\n" in pending:
+                    head, pending = pending.split("\n\n", 1)
+                    pending = pending.lstrip("\n")
+                    yield emit(head + "\n\n")
+                    done += 1
+                    yield from reused_run(indexes.index(todo[done - 1]) + 1)
+                # the NOTES: tail is held back until the trailing reused paragraphs are out
+                if NOTES_MARKER in pending:
+                    pending = pending[:pending.index(NOTES_MARKER)]
+                    in_notes = True
+                # hold back trailing newlines (a possible separator) and a partial marker
+                safe = pending.rstrip("\n")
+                partial = next((k for k in range(len(NOTES_MARKER) - 1, 0, -1) if safe.endswith(NOTES_MARKER[:k])), 0)
+                safe = safe[:len(safe) - partial].rstrip("\n")
+                if safe:
+                    yield emit(safe)
+                    pending = pending[len(safe):]
+            if pending.strip():
+                yield emit(pending.rstrip("\n"))
+            # reused paragraphs after the last translated one
+            pos = indexes.index(todo[-1]) + 1
+            if pos < len(indexes) and indexes[pos] in reused:
+                yield emit("\n\n")
+                yield from reused_run(pos)
+
+        english_text, _, notes = "".join(chunks).partition(NOTES_MARKER)
+        if notes.strip():
+            sep = "" if "".join(shown).endswith("\n\n") or not shown else "\n\n"
+            yield emit(f"{sep}{NOTES_MARKER}{notes}")
+
+        translated = [p.strip() for p in english_text.split("\n\n") if p.strip()]
+        fresh = {}
+        if not truncated and len(translated) == len(todo):
+            fresh = dict(zip(todo, translated))
+            if self.use_tm:
+                tm_store(paragraphs, fresh, self.final_terms)
+        else:
+            # cut off: the paragraphs before the last (partial) one came back complete and in order;
+            # count mismatch: no way to tell which paragraph is missing, so none is trusted
+            if truncated and len(translated) <= len(todo):
+                fresh = dict(zip(todo, translated[:-1]))
+                if self.use_tm:
+                    tm_store(paragraphs, fresh, self.final_terms)
+            missing = [i for i in todo if i not in fresh]
+            reason = "was cut off" if truncated else f"has {len(translated)} paragraph(s) for {len(todo)}"
+            print(f"⚠️ Streamed translation {reason}; requesting paragraphs {missing} again…")
+            extra, extra_notes = translate_paragraphs(paragraphs, missing, self.final_terms, use_tm=self.use_tm)
+            fresh.update(extra)
+            notes = "\n".join(n for n in (notes.strip(), extra_notes) if n)
+
+        english = {**reused, **fresh}
+        self.missing = [i for i in todo if english[i].startswith(MISSING_MARKER)]
+        self.complete = not self.missing
+        self.english = english
+        body = "\n\n".join(english[i] for i in indexes)
+        self.result = assemble_output(self.input_text, body, notes)
+        if self.on_complete:
+            self.on_complete()
+
+def translate_stream(input_text: str, final_terms: list) -> TranslationStream:
+    """Streaming translation: iterate for text deltas, then read `.result`."""
+    return TranslationStream(input_text, final_terms)
+
+def translate_function (input_text: str, final_terms: list, mode: str = "full") -> str:
     """
     Translates Mandarin → English using the verified bilingual glossary.
     Uses the predefined translation_prompt template.
+    mode="structured" returns paragraph-aligned English only and rebuilds the Mandarin section locally.
+    mode="chunked" does the same per paragraph chunk, with chunks translated in parallel.
     """
 
+    if mode == "chunked":
+        return translate_chunked(input_text, final_terms)
+    if mode == "structured":
+        return translate_structured(input_text, final_terms)
+
     # Load verified bilingual terms for prompt injection
     verified_table = make_verified_terms_block(final_terms)
 
@@ -1,7 +1,12 @@
 #import modules
 from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor, wait
 import json
 import os
+from pydantic import ValidationError
+from helper_functions.verification_cache import get_verification_cache
+from helper_functions.schema import VerifiedEntity, VerifiedEntityList
+from openai_calls.translator import is_truncated
 
 # Load API key from HuggingFace environment variables
 OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
@@ -12,35 +17,59 @@ client = OpenAI(api_key=OPENAI_API_KEY)
 # Define client with API key
 client = OpenAI(api_key=OPENAI_API_KEY)          #
 
-def web_browse(unmapped_entities: list, batch: int = 12):
-    """
-    Take the list of entities in unmapped_entities and use web browse tool.
-    """
+# default number of web lookups in flight at once
+MAX_IN_FLIGHT = int(os.environ.get("WEB_BROWSE_MAX_IN_FLIGHT", 5))
+
+# per-lookup timeout in seconds
+LOOKUP_TIMEOUT = float(os.environ.get("WEB_BROWSE_TIMEOUT", 60))
 
-    targets = unmapped_entities[:batch]
-    rows = []
 
-    for e in targets:
+def _error_row(item: dict, reason: str) -> dict:
+    """Row returned when a lookup fails or times out."""
+    zh = item.get("chinese", "")
+    return {
+        "entity_id": item.get("entity_id"),
+        "chinese": zh,
+        "translated_term": f"{zh} (unverified)",
+        "context_used": item.get("context_phrase", ""),
+        "source_links": [],
+        "verification_status": "ERROR",
+        "notes": reason
+    }
 
-        # ensure data is in a dict
-        item = e if isinstance(e, dict) else dict(e)
 
-        zh  = item.get("chinese", "")
-        ctx = item.get("context_phrase", "")
-        reg = item.get("region", "SG")
-        eid = item.get("entity_id")
+def _hint_text(item: dict) -> str:
+    """Near-match glossary candidates (from map_glossary) as one line for the prompt."""
+    candidates = item.get("candidates") or []
+    return "; ".join(f'{c["chinese"]} = {c["english"]}' for c in candidates)
+
+
+def verify_entity(e, timeout: float = LOOKUP_TIMEOUT) -> dict:
+    """
+    Research one unmapped entity with the web search tool and return its row.
+    """
 
-        prompt = f"""
+    # ensure data is in a dict
+    item = e if isinstance(e, dict) else dict(e)
+
+    zh  = item.get("chinese", "")
+    ctx = item.get("context_phrase", "")
+    reg = item.get("region", "SG")
+    eid = item.get("entity_id")
+
+    prompt = f"""
 You are a professional bilingual researcher based in Singapore.
 
 Chinese entity: "{zh}"
 Context phrase: "{ctx}"
 Region: "{reg}"
+Similar glossary entries (hints, may be partial): "{_hint_text(item) or 'none'}"
 
 ### RULES
 - Use official SG English names when available.
 - Authoritative domains only: .gov.sg, .edu.sg, .org, CNA, ST, Wikipedia.
 - Idioms: return meaning.
+- Similar glossary entries are our existing translations; reuse their official English parts where they apply.
 - If multiple credible names exist → MULTIPLE.
 - If no English form exists → pinyin + "(unverified)".
 - Return ONLY valid JSON.
@@ -57,35 +86,264 @@ JSON format to return:
 }}
 """
 
+    try:
+        resp = client.with_options(timeout=timeout, max_retries=1).responses.create(
+            model="gpt-4o-mini",
+            tools=[{"type":"web_search"}],
+            input=prompt,
+            temperature=0.2,
+            max_output_tokens=500
+        )
+
+        txt = resp.output_text or ""
+        s, t = txt.find("{"), txt.rfind("}")
+        payload = json.loads(txt[s:t+1]) if s != -1 and t != -1 else {}
+
+    except Exception as ex:
+        payload = {
+            "translated_term": f"{zh} (unverified)",
+            "verification_status": "ERROR",
+            "source_links": [],
+            "notes": f"{type(ex).__name__}"
+        }
+
+    return {
+        "entity_id": eid,
+        "chinese": zh,
+        "translated_term": payload.get("translated_term", ""),
+        "context_used": ctx,
+        "source_links": (payload.get("source_links") or [])[:3],
+        "verification_status": payload.get("verification_status", "UNVERIFIED"),
+        "notes": payload.get("notes", "")
+    }
+
+
+# schema sent with batched requests (structured output)
+BATCH_SCHEMA = {
+    "type": "json_schema",
+    "name": "verified_entities",
+    "schema": VerifiedEntityList.model_json_schema(),
+}
+
+# how many times missing/invalid entries of a batch are re-requested
+BATCH_RETRIES = 1
+
+# output budget of a batch request: fixed part plus a share per entity
+BATCH_BASE_TOKENS = 300
+TOKENS_PER_ENTITY = 250
+
+
+class BatchOutputError(Exception):
+    """The batch answer was cut off at max_output_tokens or is not valid JSON."""
+
+
+def _batch_request(items: list, timeout: float, max_output_tokens: int | None = None) -> dict:
+    """
+    One structured-output request for several entities.
+    Returns {request-local entity_id: VerifiedEntity} for the valid entries only.
+    Raises BatchOutputError if the answer was truncated or cannot be parsed.
+    """
+    lines = []
+    for i, item in enumerate(items):
+        lines.append(json.dumps({
+            "entity_id": i,
+            "chinese": item.get("chinese", ""),
+            "context_phrase": item.get("context_phrase", ""),
+            "region": item.get("region", "SG"),
+            "glossary_hints": _hint_text(item),
+        }, ensure_ascii=False))
+    entity_block = "\n".join(lines)
+
+    prompt = f"""
+You are a professional bilingual researcher based in Singapore.
+Research EACH of the Chinese entities below.
+
+### ENTITIES
+{entity_block}
+
+### RULES
+- Use official SG English names when available.
+- Authoritative domains only: .gov.sg, .edu.sg, .org, CNA, ST, Wikipedia.
+- Idioms: return meaning.
+- glossary_hints are similar terms already in our glossary; reuse their official English parts where they apply.
+- If multiple credible names exist → MULTIPLE.
+- If no English form exists → pinyin + "(unverified)".
+- Return ONE entry per entity, using the same entity_id and chinese as given.
+- Return ONLY valid JSON: {{"entities": [{{"entity_id", "chinese", "translated_term", "source_links", "verification_status", "notes"}}]}}
+"""
+
+    resp = client.with_options(timeout=timeout, max_retries=1).responses.create(
+        model="gpt-4o-mini",
+        tools=[{"type":"web_search"}],
+        input=prompt,
+        temperature=0.2,
+        max_output_tokens=max_output_tokens or BATCH_BASE_TOKENS + TOKENS_PER_ENTITY * len(items),
+        text={"format": BATCH_SCHEMA},
+    )
+
+    if is_truncated(resp):
+        raise BatchOutputError("Batch response truncated")
+    txt = resp.output_text or ""
+    s, t = txt.find("{"), txt.rfind("}")
+    try:
+        data = json.loads(txt[s:t+1]) if s != -1 and t != -1 else {}
+    except json.JSONDecodeError as ex:
+        raise BatchOutputError("Batch response is not valid JSON") from ex
+
+    # validate entry by entry so one bad entry does not discard the rest
+    valid = {}
+    for raw in data.get("entities", []) if isinstance(data, dict) else []:
         try:
-            resp = client.responses.create(
-                model="gpt-4o-mini",
-                tools=[{"type":"web_search"}],
-                input=prompt,
-                temperature=0.2,
-                max_output_tokens=500
-            )
-
-            txt = resp.output_text or ""
-            s, t = txt.find("{"), txt.rfind("}")
-            payload = json.loads(txt[s:t+1]) if s != -1 and t != -1 else {}
-
-        except Exception as ex:
-            payload = {
-                "translated_term": f"{zh} (unverified)",
-                "verification_status": "ERROR",
-                "source_links": [],
-                "notes": f"{type(ex).__name__}"
-            }
+            v = VerifiedEntity.model_validate(raw)
+        except ValidationError:
+            continue
+        if 0 <= v.entity_id < len(items) and v.translated_term.strip():
+            valid[v.entity_id] = v
+    return valid
+
+
+def _split_request(items: list, positions: list, timeout: float, max_output_tokens: int | None = None):
+    """
+    Request the entities at these positions. Returns ({position: VerifiedEntity}, error or None).
+    A truncated or unparsable answer is not sent again unchanged: the batch is
+    split in half and each half requested on its own; a single entity is
+    retried once with double the output budget.
+    """
+    try:
+        valid = _batch_request([items[i] for i in positions], timeout, max_output_tokens)
+    except BatchOutputError as ex:
+        if len(positions) > 1:
+            half = len(positions) // 2
+            print(f"↪️ Verification output cut off or invalid, splitting {len(positions)} entities into two requests…")
+            first, first_error = _split_request(items, positions[:half], timeout)
+            second, second_error = _split_request(items, positions[half:], timeout)
+            return {**first, **second}, first_error or second_error
+        if max_output_tokens is None:
+            return _split_request(items, positions, timeout, 2 * (BATCH_BASE_TOKENS + TOKENS_PER_ENTITY))
+        return {}, str(ex)
+    except Exception as ex:
+        return {}, type(ex).__name__
+    # map request-local ids back to positions in this group
+    return {positions[local_id]: v for local_id, v in valid.items()}, None
+
 
+def verify_group(group: list, timeout: float = LOOKUP_TIMEOUT, retries: int = BATCH_RETRIES) -> list:
+    """
+    Research several entities in one request and return their rows in order.
+    Entries missing from the answer (or failing validation) are re-requested
+    on their own, up to `retries` more times; truncated answers are split
+    (see _split_request).
+    """
+    items = [e if isinstance(e, dict) else dict(e) for e in group]
+    results = [None] * len(items)
+    pending = list(range(len(items)))
+
+    for _ in range(retries + 1):
+        if not pending:
+            break
+        valid, error = _split_request(items, pending, timeout)
+        last_error = error or "Missing from batch response"
+        for i, v in valid.items():
+            results[i] = v
+        pending = [i for i in pending if results[i] is None]
+
+    rows = []
+    for i, item in enumerate(items):
+        v = results[i]
+        if v is None:
+            rows.append(_error_row(item, last_error))
+            continue
         rows.append({
-            "entity_id": eid,
-            "chinese": zh,
-            "translated_term": payload.get("translated_term", ""),
-            "context_used": ctx,
-            "source_links": (payload.get("source_links") or [])[:3],
-            "verification_status": payload.get("verification_status", "UNVERIFIED"),
-            "notes": payload.get("notes", "")
+            "entity_id": item.get("entity_id"),
+            "chinese": item.get("chinese", ""),
+            "translated_term": v.translated_term,
+            "context_used": item.get("context_phrase", ""),
+            "source_links": v.source_links[:3],
+            "verification_status": v.verification_status,
+            "notes": v.notes or ""
         })
+    return rows
+
+
+def web_browse(unmapped_entities: list, batch: int = 12, max_in_flight: int | None = MAX_IN_FLIGHT, timeout: float = LOOKUP_TIMEOUT, use_cache: bool = True, group_size: int | None = None):
+    """
+    Take the list of entities in unmapped_entities and use web browse tool.
+    Lookups run concurrently (at most max_in_flight at a time); set max_in_flight
+    to 1 or None to run them one after another. Rows keep the input order.
+    With use_cache, entities researched recently are served from the local
+    verification cache and new results are stored back into it.
+    With group_size, up to group_size entities are verified per request
+    instead of one request per entity.
+    """
+
+    targets = [e if isinstance(e, dict) else dict(e) for e in unmapped_entities[:batch]]
+    if not targets:
+        return []
+
+    rows = [None] * len(targets)
+    cache = get_verification_cache() if use_cache else None
+
+    # serve repeated entities from the cache
+    if cache is not None:
+        for i, item in enumerate(targets):
+            cached = cache.get(item)
+            if cached:
+                cached.update({
+                    "entity_id": item.get("entity_id"),
+                    "context_used": item.get("context_phrase", ""),
+                })
+                rows[i] = cached
+        print(f"💾 Verification cache: {sum(r is not None for r in rows)}/{len(targets)} served locally")
+
+    pending = [i for i, r in enumerate(rows) if r is None]
+
+    # unit of work: one entity, or a group of entities sharing one request
+    size = group_size if group_size and group_size > 1 else 1
+    groups = [pending[k:k + size] for k in range(0, len(pending), size)]
+
+    def run(group):
+        if size == 1:
+            return [verify_entity(targets[group[0]], timeout)]
+        # a batched request takes longer than a single lookup
+        return verify_group([targets[i] for i in group], timeout * 2)
+
+    # sequential mode
+    if not max_in_flight or max_in_flight <= 1:
+        for group in groups:
+            for i, row in zip(group, run(group)):
+                rows[i] = row
+
+    # concurrent mode - one future per group, results collected by position
+    elif groups:
+        pool = ThreadPoolExecutor(max_workers=min(max_in_flight, len(groups)))
+        try:
+            futures = {pool.submit(run, group): group for group in groups}
+
+            # overall deadline: enough for every wave of requests plus some slack
+            waves = -(-len(groups) // max_in_flight)
+            per_request = timeout if size == 1 else timeout * 2 * (BATCH_RETRIES + 1)
+            done, not_done = wait(futures, timeout=per_request * waves + 5)
+
+            for fut in done:
+                group = futures[fut]
+                try:
+                    for i, row in zip(group, fut.result()):
+                        rows[i] = row
+                except Exception as ex:
+                    for i in group:
+                        rows[i] = _error_row(targets[i], type(ex).__name__)
+
+            for fut in not_done:
+                fut.cancel()
+                for i in futures[fut]:
+                    rows[i] = _error_row(targets[i], "Timeout")
+        finally:
+            # do not block on stragglers; they have already been marked as timed out
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    # remember new outcomes, including failures (short cooldown)
+    if cache is not None:
+        for i in pending:
+            cache.put(targets[i], rows[i])
 
     return rows
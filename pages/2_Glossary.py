@@ -3,7 +3,9 @@ import pandas as pd
 from datetime import datetime
 from helper_functions.utility import check_password
 from pathlib import Path
-from helper_functions.dropbox import read_csv_from_dropbox, write_csv_to_dropbox
+from helper_functions.glossary_store import get_glossary_store, rows_by_key
+from translation_pipeline.translation_records import affected_paragraphs, paragraphs_to_retranslate, retranslate_affected
+from openai_calls.translator import convert_markdown_to_word
 import os
 
 # region <--------- Streamlit App Configuration --------->
@@ -22,8 +24,19 @@ IMAGES_DIR = BASE_DIR / "Images"
 if not check_password():  
     st.stop()
 
-# Load Glossary
-df = read_csv_from_dropbox("/Resources/glossary.csv")
+# Load Glossary - kept for the session so edits are merged against the version the user saw;
+# reloaded when the glossary changes elsewhere, unless the user has unsaved edits
+store = get_glossary_store()
+version = store.version()
+editor_state = st.session_state.get("glossary_editor", {})
+unsaved = any(editor_state.get(k) for k in ("edited_rows", "added_rows", "deleted_rows"))
+if "glossary_base" not in st.session_state or (
+    st.session_state.get("glossary_base_version") != version and not unsaved
+):
+    st.session_state["glossary_base"] = store.read_all()
+    st.session_state["glossary_base_version"] = version
+    st.session_state.pop("glossary_editor", None)
+df = st.session_state["glossary_base"].copy()
 
 # create additional columns - edited and last modified to track edits
 for col in ["edited", "last_modified"]:
@@ -44,43 +57,106 @@ st.markdown(
     """
 )
 
+# Newer glossary available while this user has unsaved edits
+if st.session_state["glossary_base_version"] != version:
+    st.info("The glossary was updated by someone else. Your edits will be merged with it when you save.")
+    if st.button("🔄 Reload glossary (discard unsaved edits)"):
+        st.session_state.pop("glossary_base", None)
+        st.session_state.pop("glossary_editor", None)
+        st.rerun()
+
 # Editable table
 edited_clean = st.data_editor(
     df_clean,
     num_rows="dynamic",
-    use_container_width=True
+    use_container_width=True,
+    key="glossary_editor"
 )
 
 # Save changes 
 if st.button("💾 Save Changes"):
-    df = read_csv_from_dropbox("/Resources/glossary.csv")
-    
-    for idx in edited_clean.index:
-
-        # existing row
-        if idx < len(df):
-            old_row = df.loc[idx, display_cols]
-            new_row = edited_clean.loc[idx, display_cols]
-
-            if not old_row.equals(new_row):
-                df.loc[idx, display_cols] = new_row
-                df.at[idx, "edited"] = True
-                df.at[idx, "last_modified"] = datetime.now().isoformat()
-
-        # new row
-        else:
-            df.loc[idx, display_cols] = edited_clean.loc[idx, display_cols]
-            df.at[idx, "edited"] = True
-            df.at[idx, "last_modified"] = datetime.now().isoformat()
-
-    write_csv_to_dropbox(df, "/Resources/glossary.csv")
-    st.success("Changes saved ✔")
-
-    # Reload the dataframe for display so updates show immediately
-    df = read_csv_from_dropbox("/Resources/glossary.csv")
-    df_clean = df[display_cols].copy()
+    # only the rows this user changed are written; concurrent edits by
+    # other sessions are merged row by row instead of being overwritten
+    conflicts = store.save_edits(
+        df_clean,
+        edited_clean,
+        display_cols,
+        extra={"edited": True, "last_modified": datetime.now().isoformat()}
+    )
+    st.session_state["glossary_saved"] = conflicts
+
+    # remember which terms changed for the recent translations that contain them
+    base, ours = rows_by_key(df_clean, display_cols), rows_by_key(edited_clean, display_cols)
+    changed = [
+        (ours.get(k) or base.get(k))["chinese"]
+        for k in base.keys() | ours.keys() if base.get(k) != ours.get(k)
+    ]
+    for record in st.session_state.get("recent_translations", []):
+        if affected_paragraphs(record, changed):
+            record["pending_terms"] = sorted(set(record["pending_terms"]) | set(changed))
+
+    # Reload so updates show immediately
+    st.session_state.pop("glossary_base", None)
     st.rerun()
 
+# Result of the last save (shown after the reload)
+if "glossary_saved" in st.session_state:
+    conflicts = st.session_state.pop("glossary_saved")
+    st.success("Changes saved ✔")
+    if conflicts:
+        st.warning(
+            "These terms were also edited by someone else; your edits were kept for the fields you changed: "
+            + ", ".join(conflicts)
+        )
+
+# Apply glossary edits to recent translations - only the affected paragraphs are re-translated
+for n, record in enumerate(st.session_state.get("recent_translations", [])):
+    if not record["pending_terms"]:
+        continue
+    affected = affected_paragraphs(record, record["pending_terms"])
+    todo = paragraphs_to_retranslate(record, record["pending_terms"])
+    st.info(
+        f"Edited terms ({'、'.join(record['pending_terms'])}) appear in {len(affected)} paragraph(s) "
+        f"of your recent translation \"{record['headline'][:40]}\"."
+    )
+    if len(todo) > len(affected):
+        # no per-paragraph English for this translation (e.g. full mode)
+        st.caption("This translation cannot be updated paragraph by paragraph, so the whole article will be re-translated.")
+    label = (
+        f"🔄 Re-translate {len(todo)} affected paragraph(s)" if len(todo) == len(affected)
+        else f"🔄 Re-translate the whole article ({len(todo)} paragraphs)"
+    )
+    if st.button(label, key=f"retranslate_{n}"):
+        with st.spinner("Re-translating affected paragraphs…"):
+            try:
+                updated = retranslate_affected(record, record["pending_terms"])
+            except Exception as e:
+                st.error(f"⚠️ An error occurred: {e}")
+                st.stop()
+        st.session_state["recent_translations"][n] = updated
+        # the main page shows the latest translation
+        if n == 0:
+            st.session_state["translation_result"] = updated["result"]
+            st.session_state["final_terms"] = updated["final_terms"]
+        st.session_state["retranslated"] = n
+        st.rerun()
+
+# Result of the last re-translation
+if "retranslated" in st.session_state:
+    record = st.session_state["recent_translations"][st.session_state.pop("retranslated")]
+    st.success(f"Re-translated paragraph(s) {', '.join(str(i + 1) for i in record['retranslated'])} ✔")
+    with st.expander("Updated translation", expanded=True):
+        st.write(record["result"])
+    doc_path = convert_markdown_to_word(record["result"])
+    with open(doc_path, "rb") as f:
+        st.download_button(
+            label="⬇️ Download Word Document",
+            data=f.read(),
+            file_name="translation.docx",
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            on_click="ignore"
+        )
+
 #Instructions on how to edit the glossary
 with st.expander("Glossary Features"):
     st.markdown("""
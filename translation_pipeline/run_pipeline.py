@@ -1,31 +1,145 @@
 # Import modules
 import os
 import sys
+import json
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 
 # telling code where to look
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 #import functions
 from dotenv import load_dotenv
-from agents.agents import extract_entities
-from helper_functions.map_glossary import map_glossary_local, append_to_glossary_csv, merge_terms
+from agents.agents import extract_entities, extract_entities_local
+from helper_functions.chinese_script import check_language, contains_chinese
+from helper_functions.map_glossary import map_glossary_local, prescan_glossary, near_match_glossary, prioritise_unmapped, merge_terms
 from helper_functions.normalize_output import norm
 from openai_calls.web_browse import web_browse
-from openai_calls.translator import translate_function
+from openai_calls.translator import translate_function, translate_stream, translate_draft, patch_draft, PROMPT_VERSION
+from helper_functions.glossary_store import get_glossary_store, DropboxGlossaryStore
+from helper_functions.glossary_writer import enqueue_glossary_terms, glossary_writer
+from helper_functions.idiom_lexicon import get_idiom_lexicon
+from helper_functions.checkpoints import PipelineCheckpoint
+from helper_functions.result_cache import get_result_cache, ResultCache
+import threading
 from crewai import Crew, Process
 
 #set gpt model
 os.environ['OPENAI_MODEL_NAME'] = "gpt-4o-mini"
 
+#build the read-only idiom index once, at startup
+get_idiom_lexicon()
+
 #define translation pipeline
 
-def translation_pipeline(input_text, batch: int | None = 10):
+#steps 1 to 3 - everything the translation needs except the translation itself
+def prepare_terms(input_text, batch: int | None = 10, group_size: int | None = None, local_lang_check: bool = True, checkpoint: PipelineCheckpoint | None = None):
+    """
+    Run extraction, glossary mapping, web verification and glossary update.
+    Returns a dict with the output of every stage (final_terms included).
+    With local_lang_check, the language/script check runs locally instead of
+    as an LLM task, and only the extraction task is sent to the crew.
+    With a checkpoint, each stage output is persisted and a retry resumes
+    from the first stage that did not complete.
+    """
+    stages = map_terms(input_text, batch=batch, local_lang_check=local_lang_check, checkpoint=checkpoint)
+    return verify_terms(stages, group_size=group_size, checkpoint=checkpoint)
+
+#checkpoint store for one run - stage outputs depend on the text and these settings
+def make_checkpoint(input_text, batch, group_size, local_lang_check):
+    return PipelineCheckpoint(input_text, {
+        "batch": batch,
+        "group_size": group_size,
+        "local_lang_check": local_lang_check,
+        "model": os.environ.get("OPENAI_MODEL_NAME", ""),
+    })
+
+#whole-request result cache - same text, glossary version and model/prompt version
+def _result_key(input_text, batch, group_size, translation_mode, local_lang_check):
+    model_version = json.dumps({
+        "model": os.environ.get("OPENAI_MODEL_NAME", ""),
+        "prompt": PROMPT_VERSION,
+        "mode": translation_mode,
+        "batch": batch,
+        "group_size": group_size,
+        "local_lang_check": local_lang_check,
+    }, sort_keys=True)
+    return ResultCache.make_key(input_text, get_glossary_store().version(), model_version)
+
+def cached_result(input_text, batch: int | None = 10, group_size: int | None = None, translation_mode: str = "stream", local_lang_check: bool = True):
+    """(result, final_terms) of an earlier identical request, or None."""
+    hit = get_result_cache().get(_result_key(input_text, batch, group_size, translation_mode, local_lang_check))
+    print("💾 Result cache: hit" if hit else "💾 Result cache: miss")
+    return hit
+
+def remember_result(input_text, result, final_terms, batch: int | None = 10, group_size: int | None = None, translation_mode: str = "stream", local_lang_check: bool = True):
+    """
+    Store a finished request in the background. The run's own glossary
+    additions are flushed first, so the key uses the glossary version a
+    rerun of the same article will see.
+    """
+    def store():
+        glossary_writer.flush()
+        key = _result_key(input_text, batch, group_size, translation_mode, local_lang_check)
+        get_result_cache().put(key, result, final_terms)
+
+    threading.Thread(target=store, name="result-cache-store", daemon=True).start()
+
+#steps 0.5 to 1.7 - extraction and local glossary lookups
+def map_terms(input_text, batch: int | None = 10, local_lang_check: bool = True, checkpoint: PipelineCheckpoint | None = None):
+    """
+    Returns {"mapped_entities", "unmapped_entities", "skipped_entities"};
+    unmapped_entities are the ones web verification will research.
+    With a checkpoint, completed stages are loaded instead of run again.
+    """
+
+    saved = checkpoint.load("mapped") if checkpoint else None
+    if saved is not None:
+        return saved
+
+    extracted = checkpoint.load("extracted") if checkpoint else None
+    if extracted is not None:
+        prescanned, extracted_entities = extracted["prescanned"], extracted["entities"]
+    else:
+        prescanned, extracted_entities = extract_terms(input_text, local_lang_check)
+        if checkpoint:
+            checkpoint.save("extracted", {"prescanned": prescanned, "entities": extracted_entities})
+
+    return _map_extracted(input_text, prescanned, extracted_entities, batch, checkpoint)
+
+#steps 0.5 and 1 - glossary pre-scan and entity extraction
+def extract_terms(input_text, local_lang_check: bool = True):
+    """Returns (prescanned KNOWN entities, extracted entities)."""
+
+    # Step 0.5 - deterministic glossary pre-scan of the article
+    # known terms are emitted directly and the extraction agent is told to skip them
+    print("📘 Step 0.5: Scanning article against backend glossary…")
+    prescanned = prescan_glossary(input_text)
+    known_terms = "、".join(e["chinese"] for e in prescanned) or "(none)"
 
     # Step 1 - agents/ task lang check and entity extraction 
     # Use of AI agents to ensure structured output 
     print("🔍 Step 1: Running entity extraction and glossary mapping…")
-    raw_extracted_data = extract_entities.kickoff(inputs={"text": input_text})
+    if local_lang_check:
+        lang_check = check_language(input_text)
+        lang_json = json.dumps(lang_check, ensure_ascii=False)
+        print(f"✅ Language check (local): {lang_json}")
+        if lang_check["status"] != "ok" and contains_chinese(input_text):
+            # Han text the local heuristic rejected (e.g. heavy English names):
+            # let the agent path make the call instead of skipping extraction
+            print("⚠️ Local check rejected text containing Chinese; falling back to the agent check.")
+            raw_extracted_data = extract_entities.kickoff(inputs={"text": input_text, "known_terms": known_terms})
+        elif lang_check["status"] != "ok":
+            # same outcome as the agent path: nothing to extract
+            raw_extracted_data = {"entities": []}
+        else:
+            raw_extracted_data = extract_entities_local.kickoff(inputs={
+                "text": input_text,
+                "known_terms": known_terms,
+                "lang_check": lang_json
+            })
+    else:
+        raw_extracted_data = extract_entities.kickoff(inputs={"text": input_text, "known_terms": known_terms})
 
     #ensure output is in-memory dict
     clean_extracted_entities = norm(raw_extracted_data)
@@ -33,49 +147,174 @@ def translation_pipeline(input_text, batch: int | None = 10):
     extracted_entities = clean_extracted_entities.get("entities", [])
     print(f"✅ Extracted {len(extracted_entities)} entities in memory.")
 
+    return prescanned, extracted_entities
+
+#steps 1.5 to 1.7 (continued from map_terms)
+def _map_extracted(input_text, prescanned, extracted_entities, batch, checkpoint):
+
     # Step 1.5 - glossary mapping 
     # invoking function for mapping 
     print("📘 Mapping extracted terms against backend glossary…")
     mapped_entities, unmapped_entities = map_glossary_local(extracted_entities)
+    # pre-scanned terms are already KNOWN; skip any the agent returned anyway
+    seen = {e.get("chinese") for e in mapped_entities}
+    mapped_entities = [e for e in prescanned if e["chinese"] not in seen] + mapped_entities
+    # Step 1.6 - close glossary neighbours resolve locally, the rest carry them as hints
+    near_mapped, unmapped_entities = near_match_glossary(unmapped_entities)
+    mapped_entities += near_mapped
+    # Step 1.7 - one entry per term, most important first; the rest are reported as skipped
+    unmapped_entities, skipped_entities = prioritise_unmapped(unmapped_entities, input_text, batch=batch)
     # ✅ Entities mapped against glossary
     print(f"✅ Entities mapped: {len(mapped_entities)} mapped | {len(unmapped_entities)} unmapped")
 
+    stages = {
+        "mapped_entities": mapped_entities,
+        "unmapped_entities": unmapped_entities,
+        "skipped_entities": skipped_entities,
+    }
+    return checkpoint.save("mapped", stages) if checkpoint else stages
+
+#steps 2 and 3 - web verification, final terms and glossary update
+def verify_terms(stages, group_size: int | None = None, checkpoint: PipelineCheckpoint | None = None):
+    """Complete the stages from map_terms with verified_entities and final_terms."""
+    mapped_entities = stages["mapped_entities"]
+    unmapped_entities = stages["unmapped_entities"]
+    skipped_entities = stages["skipped_entities"]
+
+    final_terms = checkpoint.load("final_terms") if checkpoint else None
+    verified_entities = checkpoint.load("verified") if checkpoint else None
+    if final_terms is not None and verified_entities is not None:
+        return {**stages, "verified_entities": verified_entities, "final_terms": final_terms}
+
     # Step 2 - web browsing 
     # use of Open AI web browse function for entities tagged as "UNKNOWN" in mapped_entities.json (created in step 1.5)
-    print("🌐 Step 2: Verifying unknown/ambiguous terms via web search…")
-    verified_entities = web_browse(unmapped_entities, batch=batch)          # set batch=None to do ALL unknowns
-    print("✅ Step 2 done.")
+    if verified_entities is None:
+        print("🌐 Step 2: Verifying unknown/ambiguous terms via web search…")
+        verified_entities = web_browse(unmapped_entities, batch=None, group_size=group_size)          # already limited to `batch` by priority; group_size>1 verifies several per request
+        if checkpoint:
+            checkpoint.save("verified", verified_entities)
+        print("✅ Step 2 done.")
 
     # step 3 - building glossary 
     # invoking function to build glossary for #Step 4 
     print("📘 Step 3: Building translated terms and appending to backend glossary...")
     #combining mapped_entities and verified_entities
-    final_terms = merge_terms(mapped_entities, verified_entities) 
-    #append terms to glossary
-    append_to_glossary_csv(final_terms)
+    final_terms = merge_terms(mapped_entities, verified_entities, skipped_entities)
+    #append terms to glossary in the background (write-behind, off the critical path)
+    enqueue_glossary_terms(final_terms)
+    if checkpoint:
+        checkpoint.save("final_terms", final_terms)
     print("✅ Step 3 done.")
 
+    return {
+        **stages,
+        "verified_entities": verified_entities,
+        "final_terms": final_terms,
+    }
+
+def print_debug(stages):
+    # glossary cache effectiveness for this process (Dropbox backend)
+    if isinstance(get_glossary_store(), DropboxGlossaryStore):
+        from helper_functions.glossary_cache import glossary_cache
+        stats = glossary_cache.stats()
+        print(f"📦 Glossary cache: {stats['hits']} hits | {stats['misses']} misses | {stats['bytes_avoided']:,} bytes not re-downloaded")
+
+    # 💥 DEBUG PRINTS AT THE END
+    for name in ["mapped_entities", "unmapped_entities", "verified_entities", "skipped_entities", "final_terms"]:
+        print(f"\n====== DEBUG: {name} ======")
+        for e in stages[name]:
+            print(e)
+
+def translation_pipeline(input_text, batch: int | None = 10, group_size: int | None = None, translation_mode: str = "full", local_lang_check: bool = True, resume: bool = True, use_cache: bool = True):
+
+    # identical request already translated - skip the whole pipeline
+    if use_cache:
+        hit = cached_result(input_text, batch, group_size, translation_mode, local_lang_check)
+        if hit:
+            return hit
+
+    if translation_mode == "speculative":
+        result, final_terms = translation_pipeline_speculative(input_text, batch=batch, group_size=group_size, local_lang_check=local_lang_check, resume=resume)
+        if use_cache:
+            remember_result(input_text, result, final_terms, batch, group_size, translation_mode, local_lang_check)
+        return result, final_terms
+
+    # a failed run leaves its completed stages behind; a retry picks them up
+    checkpoint = make_checkpoint(input_text, batch, group_size, local_lang_check) if resume else None
+    stages = prepare_terms(input_text, batch=batch, group_size=group_size, local_lang_check=local_lang_check, checkpoint=checkpoint)
+    final_terms = stages["final_terms"]
+
     # Step 4 - translation in progress 
     # use of Open AI to translate and with reference to final_terms
     print("🗣️ Step 4: Translation in progress")
-    result = translate_function (input_text, final_terms)
+    result = translate_function (input_text, final_terms, mode=translation_mode)
     print("✨ Translation complete.")
+    if checkpoint:
+        checkpoint.clear()
+    if use_cache:
+        remember_result(input_text, result, final_terms, batch, group_size, translation_mode, local_lang_check)
 
-    # 💥 DEBUG PRINTS AT THE END
-    print("\n====== DEBUG: mapped_entities ======")
-    for e in mapped_entities:
-        print(e)
+    print_debug(stages)
 
-    print("\n====== DEBUG: unmapped_entities ======")
-    for e in unmapped_entities:
-        print(e)
+    return result, final_terms
 
-    print("\n====== DEBUG: verified_entities ======")
-    for e in verified_entities:
-        print(e)
+#streaming variant - the app renders the translation while it is generated
+def translation_pipeline_stream(input_text, batch: int | None = 10, group_size: int | None = None, local_lang_check: bool = True, resume: bool = True, use_cache: bool = True):
+    """
+    Run steps 1-3, then return (stream, final_terms).
+    Iterate `stream` (e.g. with st.write_stream) for English text deltas;
+    afterwards `stream.result` holds the assembled output for the .docx download.
+    Once the stream has been read to the end, checkpoints are cleared and the
+    result is stored in the result cache (see cached_result).
+    """
 
-    print("\n====== DEBUG: final_terms ======")
-    for e in final_terms:
-        print(e)
+    checkpoint = make_checkpoint(input_text, batch, group_size, local_lang_check) if resume else None
+    stages = prepare_terms(input_text, batch=batch, group_size=group_size, local_lang_check=local_lang_check, checkpoint=checkpoint)
+    print_debug(stages)
 
-    return result, final_terms
+    # Step 4 - translation streamed to the caller
+    print("🗣️ Step 4: Streaming translation")
+    stream = translate_stream(input_text, stages["final_terms"])
+
+    def on_complete():
+        # keep the checkpoint and skip the cache while any paragraph is missing,
+        # so the next submit translates again instead of serving a broken result
+        if not stream.complete:
+            return
+        if checkpoint:
+            checkpoint.clear()
+        if use_cache:
+            remember_result(input_text, stream.result, stages["final_terms"], batch, group_size, "stream", local_lang_check)
+
+    stream.on_complete = on_complete
+    return stream, stages["final_terms"]
+
+#speculative variant - translation starts while unknown terms are still being verified
+def translation_pipeline_speculative(input_text, batch: int | None = 10, group_size: int | None = None, local_lang_check: bool = True, resume: bool = True):
+    """
+    Translate a draft with the KNOWN terms (unknowns masked as placeholders)
+    in parallel with web verification, then patch the verified English into
+    the draft. Latency is roughly max(verify, translate) instead of the sum.
+    Returns (result, final_terms).
+    """
+
+    checkpoint = make_checkpoint(input_text, batch, group_size, local_lang_check) if resume else None
+    stages = map_terms(input_text, batch=batch, local_lang_check=local_lang_check, checkpoint=checkpoint)
+    known_terms = merge_terms(stages["mapped_entities"], [])
+    pending = [e.get("chinese", "") for e in stages["unmapped_entities"]]
+
+    # Step 2/3 and Step 4 side by side
+    print(f"🗣️ Step 4: Drafting translation while {len(pending)} term(s) are verified")
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        draft_future = pool.submit(translate_draft, input_text, known_terms, pending)
+        stages = pool.submit(verify_terms, stages, group_size, checkpoint).result()
+        draft = draft_future.result()
+
+    result = patch_draft(draft, stages["final_terms"])
+    print("✨ Translation complete.")
+    if checkpoint:
+        checkpoint.clear()
+
+    print_debug(stages)
+
+    return result, stages["final_terms"]
@@ -0,0 +1,109 @@
+# Import
+from helper_functions.chinese_script import normalize, fold, fold_chars
+from helper_functions.glossary_store import get_glossary_store
+from openai_calls.translator import split_paragraphs, translate_paragraphs, assemble_output
+
+# Recent translations kept by the app, so glossary edits can be applied to them
+# (Glossary page). Kept apart from run_pipeline so the page does not load the
+# agents and the rest of the pipeline.
+
+def english_paragraphs(result, count):
+    """English paragraphs of an assembled result, or None if they do not line up with the source."""
+    if not isinstance(result, str) or "2) English Translation" not in result:
+        return None
+    body = result.split("2) English Translation", 1)[1].split("3) Notes (optional)", 1)[0]
+    paragraphs = [p.strip() for p in body.split("\n\n") if p.strip()]
+    return paragraphs if len(paragraphs) == count else None
+
+def record_translation(input_text, result, final_terms, english=None):
+    """
+    What the app remembers about a finished translation: source, result,
+    final_terms, English per paragraph and which paragraphs use which term.
+    english is the translator's {index: english} when available; otherwise it
+    is recovered from the assembled result, which works for every mode that
+    builds its output paragraph by paragraph (cache hits included). It stays
+    None when the output does not line up with the source (e.g. mode "full").
+    """
+    paragraphs = split_paragraphs(input_text)
+    if isinstance(english, dict):
+        english = [english[i] for i in range(len(paragraphs))]
+    if english is None or len(english) != len(paragraphs):
+        english = english_paragraphs(result, len(paragraphs))
+    folded = [fold_chars(p) for p in paragraphs]
+    return {
+        "headline": paragraphs[0] if paragraphs else "",
+        "input_text": input_text,
+        "result": result,
+        "final_terms": final_terms,
+        "english": english,
+        "term_paragraphs": {
+            t["chinese"]: [i for i, p in enumerate(folded) if fold(t["chinese"]) in p]
+            for t in final_terms if t.get("chinese")
+        },
+        "pending_terms": [],
+    }
+
+def affected_paragraphs(record, changed_terms):
+    """Indexes of the paragraphs that contain any of the changed Chinese terms."""
+    keys = {fold(t) for t in changed_terms if fold(t)}
+    hit = set()
+    for zh, idx in record["term_paragraphs"].items():
+        if fold(zh) in keys:
+            hit.update(idx)
+    # terms that were not used in this translation yet (e.g. newly added)
+    for i, p in enumerate(split_paragraphs(record["input_text"])):
+        if any(k in fold_chars(p) for k in keys):
+            hit.add(i)
+    return sorted(hit)
+
+def paragraphs_to_retranslate(record, changed_terms):
+    """
+    Paragraph indexes retranslate_affected will send to the model: only the
+    affected ones, or every paragraph when the record has no per-paragraph English.
+    """
+    if record["english"] is None:
+        return list(range(len(split_paragraphs(record["input_text"]))))
+    return affected_paragraphs(record, changed_terms)
+
+def retranslate_affected(record, changed_terms):
+    """
+    Refresh the changed terms from the glossary and re-translate only the
+    paragraphs that contain them; every other paragraph is kept as it was.
+    Without per-paragraph English the whole article is translated again.
+    Returns the updated record ("retranslated" lists the paragraph indexes sent).
+    """
+    # the result cache helpers live with the pipeline; only needed once a re-translation runs
+    from translation_pipeline.run_pipeline import remember_result
+
+    paragraphs = split_paragraphs(record["input_text"])
+    todo = paragraphs_to_retranslate(record, changed_terms)
+
+    # current glossary rows for the changed terms (deleted terms are dropped)
+    rows = get_glossary_store().get(changed_terms)
+    changed_keys = {normalize(t) for t in changed_terms}
+    final_terms = [t for t in record["final_terms"] if normalize(t.get("chinese", "")) not in changed_keys]
+    for row in rows.values():
+        final_terms.append({
+            "chinese": row["chinese"],
+            "english": row.get("english", ""),
+            "status": "KNOWN",
+            "source": "glossary (edited)",
+            "links": [l for l in str(row.get("links", "")).split("; ") if l]
+        })
+
+    english = dict(enumerate(record["english"])) if record["english"] is not None else {}
+
+    print(f"✏️ Re-translating {len(todo)} of {len(paragraphs)} paragraph(s) after glossary edits…")
+    fresh, notes = translate_paragraphs(paragraphs, todo, final_terms) if todo else ({}, "")
+    english.update(fresh)
+
+    # keep the notes of the original translation
+    old_notes = record["result"].split("3) Notes (optional)", 1)[1].strip() if "3) Notes (optional)" in str(record["result"]) else ""
+    notes = "\n".join(n for n in (old_notes, notes) if n)
+
+    result = assemble_output(record["input_text"], "\n\n".join(english[i] for i in range(len(paragraphs))), notes)
+    updated = record_translation(record["input_text"], result, final_terms, english)
+    updated["retranslated"] = todo
+    # a rerun of the same article against the edited glossary is served from here
+    remember_result(record["input_text"], result, final_terms)
+    return updated